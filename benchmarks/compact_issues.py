@@ -0,0 +1,110 @@
+"""
+Memory held by a list of parsed issues: youtrack.Issue objects against
+youtrack.compact.CompactIssue records sharing one project schema.
+
+    python benchmarks/compact_issues.py [issues]
+"""
+
+import sys
+import time
+import tracemalloc
+from xml.dom import minidom
+
+import youtrack
+from youtrack import xmlwriter
+from youtrack.compact import CompactIssue, IssueSchemas
+
+ISSUE = '''<issue id="ABC-%(n)d" entityId="%(n)d-1">
+<field xsi:type="SingleField" name="projectShortName"><value>ABC</value></field>
+<field xsi:type="SingleField" name="numberInProject"><value>%(n)d</value></field>
+<field xsi:type="SingleField" name="summary"><value>Summary of issue %(n)d</value></field>
+<field xsi:type="SingleField" name="description"><value>Description of issue %(n)d</value></field>
+<field xsi:type="SingleField" name="created"><value>%(created)d</value></field>
+<field xsi:type="SingleField" name="updated"><value>%(updated)d</value></field>
+<field xsi:type="SingleField" name="updaterName"><value>user%(updater)d</value></field>
+<field xsi:type="SingleField" name="reporterName"><value>user%(reporter)d</value></field>
+<field xsi:type="SingleField" name="commentsCount"><value>%(comments)d</value></field>
+<field xsi:type="SingleField" name="votes"><value>0</value></field>
+<field xsi:type="MultiUserField" name="Assignee"><value fullName="User">user%(assignee)d</value></field>
+<field xsi:type="CustomFieldValue" name="Priority"><value>%(priority)s</value></field>
+<field xsi:type="CustomFieldValue" name="Type"><value>%(type)s</value></field>
+<field xsi:type="CustomFieldValue" name="State"><value>%(state)s</value></field>
+<field xsi:type="CustomFieldValue" name="Subsystem"><value>Subsystem %(subsystem)d</value></field>
+<field xsi:type="CustomFieldValue" name="Fix versions"><value>1.%(version)d</value><value>2.%(version)d</value></field>
+</issue>'''
+
+PRIORITIES = ['Minor', 'Normal', 'Major', 'Critical']
+TYPES = ['Bug', 'Feature', 'Task']
+STATES = ['Submitted', 'Open', 'In Progress', 'Fixed', 'Verified']
+
+
+def make_document(start, count):
+    issues = [ISSUE % {'n': n, 'created': 1262000000000 + n * 1000, 'updated': 1262000500000 + n * 1000,
+                       'updater': n % 50, 'reporter': n % 70, 'comments': n % 7, 'assignee': n % 30,
+                       'priority': PRIORITIES[n % 4], 'type': TYPES[n % 3], 'state': STATES[n % 5],
+                       'subsystem': n % 12, 'version': n % 9}
+              for n in range(start, start + count)]
+    return ('<issues xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">' + ''.join(issues) +
+            '</issues>').encode('utf-8')
+
+
+def parse(count, factory, page_size=1000):
+    result = []
+    for start in range(1, count + 1, page_size):
+        document = minidom.parseString(make_document(start, min(page_size, count + 1 - start)))
+        result.extend(factory(e) for e in document.documentElement.getElementsByTagName('issue'))
+        document.unlink()
+    return result
+
+
+def measure(count, factory):
+    tracemalloc.start()
+    started = time.time()
+    issues = parse(count, factory)
+    elapsed = time.time() - started
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return issues, elapsed, retained
+
+
+class CommentsSource(object):
+    # answers Connection.getComments for check_import_body
+    def getComments(self, issue_id):
+        comment = youtrack.Comment()
+        comment.author = 'user1'
+        comment.text = 'Comment on %s' % issue_id
+        comment.created = '1262000000000'
+        return [comment]
+
+
+def check_import_body():
+    """ CompactIssue records must produce the same importIssues body as Issue objects, comments included.
+    """
+    document = minidom.parseString(make_document(1, 2))
+    issues = [youtrack.Issue(e, CommentsSource()) for e in document.documentElement.getElementsByTagName('issue')]
+    compact = [CompactIssue.from_object(issue, IssueSchemas(CommentsSource()).get('ABC')) for issue in issues]
+    expected, _ = xmlwriter.issues_document(issues, [])
+    body, _ = xmlwriter.issues_document(compact, [])
+    assert b'text="Comment on ABC-2"' in body, body
+    assert body == expected
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    check_import_body()
+    issues, issue_time, issue_memory = measure(count, lambda e: youtrack.Issue(e))
+    del issues
+    schemas = IssueSchemas()
+    compact, compact_time, compact_memory = measure(
+        count, lambda e: CompactIssue.from_object(youtrack.Issue(e), schemas.get('ABC')))
+    sample = youtrack.Issue(minidom.parseString(make_document(7, 1)).documentElement.firstChild)
+    assert dict((name, compact[6][name]) for name in compact[6]) == dict((name, sample[name]) for name in sample)
+    print('%d issues' % count)
+    print('Issue         %.1f MiB retained (%d bytes per issue), %.2fs' %
+          (issue_memory / 2.0 ** 20, issue_memory / count, issue_time))
+    print('CompactIssue  %.1f MiB retained (%d bytes per issue), %.2fs' %
+          (compact_memory / 2.0 ** 20, compact_memory / count, compact_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Request count and wall-clock time of Connection.getCustomFields against a
+simulated server with a fixed per-request latency.
+
+pool_size=1 fetches field details one by one (the old behaviour),
+larger pools fetch them concurrently.
+
+    python benchmarks/custom_fields.py [fields] [latency_ms]
+"""
+
+import sys
+import threading
+import time
+
+import youtrack.connection
+from youtrack.connection import Connection
+
+
+class FakeResponse(dict):
+    def __init__(self, status, headers):
+        dict.__init__(self, headers)
+        self.status = status
+        self.reason = 'OK'
+
+
+class FakeServer(object):
+    def __init__(self, fields, latency):
+        self.fields = fields
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        name = uri.rsplit('/', 1)[1]
+        if name == 'field':
+            content = '<customFields>%s</customFields>' % ''.join(
+                '<customField name="field%d" url="x"/>' % i for i in range(self.fields))
+        else:
+            content = '<customFieldPrototype name="%s" type="enum[1]" isPrivate="false" ' \
+                      'visibleByDefault="true" autoAttached="false"/>' % name
+        return FakeResponse(200, {'content-type': 'application/xml'}), content.encode('utf-8')
+
+
+def run(server, pool_size):
+    youtrack.connection.httplib2.Http = lambda **kwargs: server
+    connection = Connection('http://localhost/youtrack', token='perm:benchmark', pool_size=pool_size)
+    server.requests = 0
+    started = time.time()
+    fields = connection.getCustomFields()
+    elapsed = time.time() - started
+    assert len(fields) == server.fields
+    return server.requests, elapsed
+
+
+def main():
+    field_count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    server = FakeServer(field_count, latency)
+    print('%d custom fields, %.0f ms per request' % (field_count, latency * 1000))
+    for pool_size in (1, 8, 32):
+        requests, elapsed = run(server, pool_size)
+        print('pool_size=%-3d requests=%-5d time=%.2fs' % (pool_size, requests, elapsed))
+
+
+if __name__ == '__main__':
+    main()
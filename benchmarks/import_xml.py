@@ -0,0 +1,92 @@
+"""
+Build time and peak memory of the importIssues request body: the former
+string-concatenation builder against youtrack.xmlwriter.
+
+    python benchmarks/import_xml.py [issues] [description_kb]
+"""
+
+import sys
+import time
+import tracemalloc
+from xml.sax.saxutils import escape, quoteattr
+
+from youtrack import xmlwriter
+
+BAD_FIELDS = ['id', 'projectShortName', 'votes', 'commentsCount', 'links', 'attachments', 'tags']
+
+
+def legacy_issues_document(issues, bad_fields):
+    # the builder importIssues used before, minus its bytes/str mixing
+    xml = '<issues>\n'
+    issue_records = dict([])
+    for issue in issues:
+        record = ""
+        record += '  <issue>\n'
+        comments = None
+        for issueAttr in issue:
+            attrValue = issue[issueAttr]
+            if attrValue is None:
+                continue
+            if issueAttr == 'comments':
+                comments = attrValue
+            elif issueAttr not in bad_fields:
+                record += '    <field name="' + issueAttr + '">\n'
+                if isinstance(attrValue, list):
+                    for v in attrValue:
+                        record += '      <value>' + escape(v.strip()) + '</value>\n'
+                else:
+                    record += '      <value>' + escape(attrValue.strip()) + '</value>\n'
+                record += '    </field>\n'
+        if comments:
+            for comment in comments:
+                record += '    <comment'
+                for ca in comment:
+                    record += ' ' + ca + '=' + quoteattr(comment[ca], {"\n": "&#xA;"})
+                record += '/>\n'
+        record += '  </issue>\n'
+        xml += record
+        issue_records[issue['numberInProject']] = record
+    xml += '</issues>'
+    return xml.encode('utf-8'), issue_records
+
+
+def make_issues(count, description_kb):
+    description = ('Steps to reproduce & <expected> result. ' * 26 * description_kb)[:1024 * description_kb]
+    return [{'numberInProject': str(i),
+             'summary': 'Issue number %d' % i,
+             'description': description,
+             'created': '1262000000000',
+             'updated': '1262000100000',
+             'reporterName': 'root',
+             'Priority': 'Normal',
+             'State': 'Open',
+             'Fix versions': ['1.0', '2.0'],
+             'comments': [{'author': 'root', 'text': 'comment\n%d' % c, 'created': '1262000000000'}
+                          for c in range(3)]}
+            for i in range(1, count + 1)]
+
+
+def measure(builder, issues):
+    tracemalloc.start()
+    started = time.time()
+    body, records = builder(issues, BAD_FIELDS)
+    elapsed = time.time() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return body, elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    description_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    issues = make_issues(count, description_kb)
+    legacy_body, legacy_time, legacy_peak = measure(legacy_issues_document, issues)
+    body, new_time, new_peak = measure(xmlwriter.issues_document, issues)
+    assert body == legacy_body
+    print('%d issues, %d KiB descriptions, %.1f MiB body' % (count, description_kb, len(body) / 2.0 ** 20))
+    print('concatenation  time=%.3fs  peak=%.1f MiB' % (legacy_time, legacy_peak / 2.0 ** 20))
+    print('xmlwriter      time=%.3fs  peak=%.1f MiB' % (new_time, new_peak / 2.0 ** 20))
+
+
+if __name__ == '__main__':
+    main()
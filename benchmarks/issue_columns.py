@@ -0,0 +1,76 @@
+"""
+Issues per second turned into youtrack.columnar.IssueColumns, and the bytes
+the columns take per issue, for generated issues with enum, state, user,
+string and date custom fields.
+Only the enum, state and user fields may become categorical columns.
+
+    python benchmarks/issue_columns.py [issues]
+"""
+
+import sys
+import time
+from xml.dom import minidom
+
+import youtrack
+from youtrack.columnar import IssueColumns
+from youtrack.decoder import decode_issue
+
+ISSUE = '''<issue id="ABC-%(n)d">
+<field xsi:type="SingleField" name="projectShortName"><value>ABC</value></field>
+<field xsi:type="SingleField" name="numberInProject"><value>%(n)d</value></field>
+<field xsi:type="SingleField" name="created"><value>%(created)d</value></field>
+<field xsi:type="SingleField" name="resolved"><value>%(resolved)d</value></field>
+<field xsi:type="SingleField" name="reporterName"><value>user%(reporter)d</value></field>
+<field xsi:type="MultiUserField" name="Assignee"><value fullName="User">user%(assignee)d</value></field>
+<field xsi:type="CustomFieldValue" name="Priority"><value>%(priority)s</value></field>
+<field xsi:type="CustomFieldValue" name="State"><value>%(state)s</value></field>
+<field xsi:type="CustomFieldValue" name="Customer note"><value>Note %(n)d</value></field>
+<field xsi:type="CustomFieldValue" name="Due date"><value>%(due)d</value></field>
+</issue>'''
+
+FIELD_TYPES = {'Assignee': 'user[1]', 'Priority': 'enum[1]', 'State': 'state[1]',
+               'Customer note': 'string', 'Due date': 'date'}
+PRIORITIES = ['Minor', 'Normal', 'Major', 'Critical']
+STATES = ['Submitted', 'Open', 'In Progress', 'Fixed', 'Verified']
+
+
+class FieldTypes(object):
+    # answers Connection.getProjectCustomField with the types above
+    def __init__(self):
+        self.lookups = 0
+
+    def getProjectCustomField(self, project_id, name):
+        self.lookups += 1
+        field = youtrack.ProjectCustomField()
+        field.name = name
+        field.type = FIELD_TYPES[name]
+        return field
+
+
+def make_issues(count):
+    issues = [ISSUE % {'n': n, 'created': 1262000000000 + n * 1000, 'resolved': 1262003600000 + n * 7000,
+                       'reporter': n % 70, 'assignee': n % 30, 'priority': PRIORITIES[n % 4],
+                       'state': STATES[n % 5], 'due': 1263000000000 + n * 60000}
+              for n in range(1, count + 1)]
+    document = minidom.parseString(('<issues xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">' +
+                                    ''.join(issues) + '</issues>').encode('utf-8'))
+    return [decode_issue(e) for e in document.documentElement.getElementsByTagName('issue')]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    issues = make_issues(count)
+    field_types = FieldTypes()
+    started = time.time()
+    columns = IssueColumns.from_issues(issues, connection=field_types, ids=False)
+    elapsed = time.time() - started
+    assert sorted(columns.categories) == ['Assignee', 'Priority', 'State', 'reporterName'], sorted(columns.categories)
+    assert field_types.lookups == 4, field_types.lookups
+    size = (sum(len(c) * c.itemsize for c in list(columns.dates.values()) + list(columns.numbers.values())) +
+            sum(len(c.codes) * c.codes.itemsize for c in columns.categories.values()))
+    print('%d issues, categorical: %s' % (count, ', '.join(sorted(columns.categories))))
+    print('IssueColumns  %8.0f issues/s, %d bytes per issue' % (count / elapsed, size / count))
+
+
+if __name__ == '__main__':
+    main()
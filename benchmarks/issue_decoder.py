@@ -0,0 +1,53 @@
+"""
+Issues decoded per second from a recorded /rest/issue/byproject response:
+youtrack.Issue against the single-pass youtrack.decoder.decode_issue.
+Both must produce the same attributes, in the same order.
+
+    python benchmarks/issue_decoder.py [repeat] [response.xml]
+"""
+
+import os
+import sys
+import time
+from xml.dom import Node, minidom
+
+import youtrack
+from youtrack.decoder import decode_issue
+
+RESPONSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'issues_byproject.xml')
+
+
+def attributes(obj):
+    result = []
+    for name, value in obj.__dict__.items():
+        if name == 'youtrack':
+            continue
+        if isinstance(value, list):
+            value = [attributes(v) if isinstance(v, youtrack.YouTrackObject) else v for v in value]
+        result.append((name, value))
+    return result
+
+
+def rate(factory, elements, repeat):
+    started = time.time()
+    for _ in range(repeat):
+        for e in elements:
+            factory(e)
+    return repeat * len(elements) / (time.time() - started)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    path = sys.argv[2] if len(sys.argv) > 2 else RESPONSE
+    with open(path, 'rb') as f:
+        document = minidom.parseString(f.read())
+    elements = [e for e in document.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+    for e in elements:
+        assert attributes(youtrack.Issue(e)) == attributes(decode_issue(e)), e.getAttribute('id')
+    print('%d issues x %d' % (len(elements), repeat))
+    print('Issue         %8.0f issues/s' % rate(youtrack.Issue, elements, repeat))
+    print('decode_issue  %8.0f issues/s' % rate(decode_issue, elements, repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Issues per second read by youtrack.api.issue_from_json from /api/issues entities
+made out of a recorded /rest/issue/byproject response.
+Each issue must get the same fields, custom_fields and custom field types as
+youtrack.Issue gives the XML it was made from.
+
+    python benchmarks/json_issues.py [repeat] [response.xml]
+"""
+
+import os
+import sys
+import time
+from xml.dom import Node, minidom
+
+import youtrack
+from youtrack import api
+
+RESPONSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'issues_byproject.xml')
+
+
+def json_value(value, attribute_type):
+    if isinstance(value, list):
+        return [json_value(v, attribute_type) for v in value]
+    if attribute_type == 'MultiUserField':
+        return {'$type': 'User', 'login': value}
+    return {'$type': 'EnumBundleElement', 'name': value}
+
+
+def json_issue(issue):
+    # the entity /api/issues returns for issue with the default projection
+    data = {'$type': 'Issue', 'idReadable': issue.id, 'id': issue.entityId,
+            'numberInProject': int(issue.numberInProject), 'project': {'shortName': issue.projectShortName},
+            'summary': issue.summary, 'description': getattr(issue, 'description', None),
+            'reporter': {'login': issue.reporterName}, 'updater': {'login': issue.updaterName},
+            'customFields': []}
+    for name in ('created', 'updated', 'resolved'):
+        if hasattr(issue, name):
+            data[name] = int(issue[name])
+    for name, attribute_type in issue._attribute_types.items():
+        if attribute_type not in ('CustomFieldValue', 'MultiUserField'):
+            continue
+        value = issue[name]
+        kind = 'User' if attribute_type == 'MultiUserField' else 'Enum'
+        data['customFields'].append({'$type': ('Multi' if isinstance(value, list) else 'Single') + kind + 'IssueCustomField',
+                                     'name': name, 'value': json_value(value, attribute_type)})
+    return data
+
+
+def fields(issue, names):
+    return [(name, issue[name]) for name in names if hasattr(issue, name)]
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    path = sys.argv[2] if len(sys.argv) > 2 else RESPONSE
+    with open(path, 'rb') as f:
+        document = minidom.parseString(f.read())
+    issues = [youtrack.Issue(e) for e in document.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+    entities = [json_issue(issue) for issue in issues]
+    for issue, data in zip(issues, entities):
+        from_json = api.issue_from_json(data)
+        custom = [name for name, t in issue._attribute_types.items() if t in ('CustomFieldValue', 'MultiUserField')]
+        assert fields(from_json, api.DEFAULT_FIELDS) == fields(issue, api.DEFAULT_FIELDS), issue.id
+        assert from_json.custom_fields == issue.custom_fields, issue.id
+        assert [(name, from_json._attribute_types.get(name)) for name in custom] == \
+               [(name, issue._attribute_types[name]) for name in custom], issue.id
+    started = time.time()
+    for _ in range(repeat):
+        for data in entities:
+            api.issue_from_json(data)
+    print('%d issues x %d' % (len(entities), repeat))
+    print('issue_from_json  %8.0f issues/s' % (repeat * len(entities) / (time.time() - started)))
+
+
+if __name__ == '__main__':
+    main()
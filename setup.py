@@ -23,6 +23,9 @@ setup(
         'httplib2 >= 0.7.4',
         'six'
     ],
+    extras_require={
+        'columnar': ['numpy'],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: Apache Software License",
@@ -54,6 +54,14 @@ class YouTrackException(Exception):
         Exception.__init__(self, msg)
 
 
+def _plain(value):
+    if isinstance(value, YouTrackObject):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
 class YouTrackObject(object):
     def __init__(self, xml=None, youtrack=None):
         self.youtrack = youtrack
@@ -83,30 +91,34 @@ class YouTrackObject(object):
         if children:
             for c in children:
                 name = c.getAttribute('name')
-                value = None
                 if not len(name):
                     continue
-                values = c.getElementsByTagName('value')
-                # TODO: The code is needed to work correctly with localized YT
-                # value_ids = c.getElementsByTagName('valueId')
-                if (values is not None) and len(values):
-                    if values.length == 1:
-                        # if value_ids:
-                        #    value = self._text(value_ids.item(0))
-                        # else:
-                        value = self._text(values.item(0))
-                    elif values.length > 1:
-                        # if value_ids:
-                        #    value = [self._text(value) for value in value_ids]
-                        # else:
-                        value = [self._text(value) for value in values]
-                elif c.hasAttribute('value'):
-                    value = c.getAttribute('value')
+                value = self._fieldValue(c)
                 if value is not None:
                     setattr(self, name, value)
                     if c.hasAttribute('xsi:type'):
                         self._attribute_types[name] = c.getAttribute('xsi:type')
 
+    def _fieldValue(self, c):
+        value = None
+        values = c.getElementsByTagName('value')
+        # TODO: The code is needed to work correctly with localized YT
+        # value_ids = c.getElementsByTagName('valueId')
+        if (values is not None) and len(values):
+            if values.length == 1:
+                # if value_ids:
+                #    value = self._text(value_ids.item(0))
+                # else:
+                value = self._text(values.item(0))
+            elif values.length > 1:
+                # if value_ids:
+                #    value = [self._text(value) for value in value_ids]
+                # else:
+                value = [self._text(value) for value in values]
+        elif c.hasAttribute('value'):
+            value = c.getAttribute('value')
+        return value
+
     def _text(self, el):
         return "".join([e.data for e in el.childNodes if e.nodeType == Node.TEXT_NODE])
 
@@ -119,17 +131,14 @@ class YouTrackObject(object):
         return _repr
 
     def to_dict(self):
-        data = self.__dict__
-        try:
-            del data['youtrack']
-        except KeyError as e:
-            pass
-            #print('Failed to remove key. {0}'.format(e))
-        try:
-            del data['_attribute_types']
-        except KeyError as e:
-            pass
-            #print('Failed to remove key. {0}'.format(e))
+        """ Returns the fields in a new dict, nested objects converted as well.
+            The object itself is left untouched; values are shared, not copied.
+        """
+        data = dict()
+        for k, v in self.__dict__.items():
+            if k in ('youtrack', '_attribute_types'):
+                continue
+            data[k] = _plain(v)
         return data
 
     def __iter__(self):
@@ -183,8 +192,8 @@ class Issue(YouTrackObject):
         if hasattr(self, name):
             attrValue = self[name]
             if not isinstance(attrValue, list):
-                if isinstance(attrValue, str):
-                    attrValue = attrValue.encode('utf-8')
+                if isinstance(attrValue, bytes):
+                    attrValue = attrValue.decode('utf-8')
                 if attrValue is None or not len(attrValue):
                     delattr(self, name)
                 else:
@@ -250,6 +259,104 @@ class Issue(YouTrackObject):
         return cf
 
 
+class LazyIssue(Issue):
+    """ Issue that keeps its XML element and decodes a field only when it is first read;
+        the decoded value is kept as a regular attribute.
+        Iterating, to_dict() and repr() decode all remaining fields and release the element.
+    """
+    def __init__(self, xml=None, youtrack=None):
+        self.youtrack = youtrack
+        self._attribute_types = dict()
+        if xml is None:
+            return
+        if isinstance(xml, Document):
+            xml = xml.documentElement
+        self._updateFromAttrs(xml)
+        fields = dict()
+        for c in xml.childNodes:
+            if c.nodeType != Node.ELEMENT_NODE:
+                continue
+            name = c.getAttribute('name')
+            if not len(name):
+                continue
+            fields[name] = c
+            if c.hasAttribute('xsi:type') and (c.hasAttribute('value') or c.firstChild is not None):
+                self._attribute_types[name] = c.getAttribute('xsi:type')
+        self._element = xml
+        self._fields = fields
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('_element', '_fields'):
+            raise AttributeError(name)
+        fields = self.__dict__.get('_fields')
+        if fields is None:
+            raise AttributeError(name)
+        value = self._decode(name, fields)
+        setattr(self, name, value)
+        return value
+
+    def _decode(self, name, fields):
+        element = self._element
+        if name == 'links':
+            if not len(element.getElementsByTagName('links')):
+                return None
+            return [Link(e, self.youtrack) for e in element.getElementsByTagName('issueLink')]
+        if name == 'tags':
+            return [self._text(e) for e in element.getElementsByTagName('tag')] or None
+        if name == 'attachments':
+            if not len(element.getElementsByTagName('attachments')):
+                return None
+            return [Attachment(e, self.youtrack) for e in element.getElementsByTagName('fileUrl')]
+        if name not in fields:
+            raise AttributeError(name)
+        value = self._fieldValue(fields[name])
+        if value is None:
+            raise AttributeError(name)
+        if name in ('fixedVersion', 'affectsVersion') and not isinstance(value, list):
+            if not len(value):
+                raise AttributeError(name)
+            value = [v.strip() for v in value.split(',')]
+        elif name == 'fixedInBuild' and value == 'Next build':
+            value = None
+        return value
+
+    def materialize(self):
+        """ Decodes every field that hasn't been read yet.
+        """
+        fields = self.__dict__.get('_fields')
+        if fields is None:
+            return self
+        for name in list(fields) + ['links', 'tags', 'attachments']:
+            if name not in self.__dict__:
+                try:
+                    getattr(self, name)
+                except AttributeError:
+                    pass
+        del self.__dict__['_fields']
+        del self.__dict__['_element']
+        return self
+
+    def __iter__(self):
+        self.materialize()
+        return Issue.__iter__(self)
+
+    def __getitem__(self, key):
+        if key in self.__dict__:
+            return self.__dict__[key]
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def to_dict(self):
+        self.materialize()
+        return Issue.to_dict(self)
+
+    def __repr__(self):
+        self.materialize()
+        return Issue.__repr__(self)
+
+
 class Comment(YouTrackObject):
     def __init__(self, xml=None, youtrack=None):
         YouTrackObject.__init__(self, xml, youtrack)
@@ -327,7 +434,10 @@ class Attachment(YouTrackObject):
         self.url = re.sub(r'^.*?(?=/_persistent)', '', self.url)
 
     def getContent(self):
-        return self.youtrack.getAttachmentContent(self.url.encode('utf-8'))
+        return self.youtrack.getAttachmentContent(self.url)
+
+    def download(self, destination, **kwargs):
+        return self.youtrack.downloadAttachment(self.url, destination, **kwargs)
 
     def getAuthor(self):
         if self.authorLogin == '<no user>':
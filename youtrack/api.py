@@ -0,0 +1,123 @@
+"""
+Reads issues from the JSON /api endpoints, asking only for the fields the caller
+names, and maps them onto the same youtrack.Issue attributes the XML /rest
+endpoints produce.
+"""
+
+import youtrack
+
+
+def _millis(value):
+    return None if value is None else str(value)
+
+
+def _login(key):
+    return lambda data: (data.get(key) or {}).get('login')
+
+
+def _full_name(key):
+    return lambda data: (data.get(key) or {}).get('fullName')
+
+
+# Issue attribute -> (projection, reader of the attribute value from the JSON issue)
+ISSUE_FIELDS = {
+    'id': (('idReadable', None), lambda data: data.get('idReadable')),
+    'entityId': (('id', None), lambda data: data.get('id')),
+    'numberInProject': (('numberInProject', None), lambda data: _millis(data.get('numberInProject'))),
+    'projectShortName': (('project', 'shortName'), lambda data: (data.get('project') or {}).get('shortName')),
+    'summary': (('summary', None), lambda data: data.get('summary')),
+    'description': (('description', None), lambda data: data.get('description')),
+    'created': (('created', None), lambda data: _millis(data.get('created'))),
+    'updated': (('updated', None), lambda data: _millis(data.get('updated'))),
+    'resolved': (('resolved', None), lambda data: _millis(data.get('resolved'))),
+    'reporterName': (('reporter', 'login'), _login('reporter')),
+    'reporterFullName': (('reporter', 'fullName'), _full_name('reporter')),
+    'updaterName': (('updater', 'login'), _login('updater')),
+    'updaterFullName': (('updater', 'fullName'), _full_name('updater')),
+    'votes': (('votes', None), lambda data: _millis(data.get('votes'))),
+    'commentsCount': (('commentsCount', None), lambda data: _millis(data.get('commentsCount'))),
+}
+
+DEFAULT_FIELDS = ('id', 'entityId', 'numberInProject', 'projectShortName', 'summary', 'description',
+                  'created', 'updated', 'resolved', 'reporterName', 'updaterName')
+
+CUSTOM_FIELDS_PROJECTION = 'customFields(name,value(name,login,presentation,text))'
+
+
+def issue_projection(fields=None):
+    """ Returns (fields= projection, custom field names) for the Issue attributes in fields.
+        Names that aren't standard issue attributes are taken for custom fields.
+        With fields=None the default attributes and all custom fields are requested,
+        signalled by None in place of custom field names.
+    """
+    custom_fields = []
+    if fields is None:
+        fields = DEFAULT_FIELDS
+        custom_fields = None
+    projections = {}
+    order = []
+    for name in fields:
+        if name not in ISSUE_FIELDS:
+            if custom_fields is not None and name not in custom_fields:
+                custom_fields.append(name)
+            continue
+        (top, sub), reader = ISSUE_FIELDS[name]
+        if top not in projections:
+            projections[top] = []
+            order.append(top)
+        if sub is not None and sub not in projections[top]:
+            projections[top].append(sub)
+    parts = [top + ('(%s)' % ','.join(projections[top]) if projections[top] else '') for top in order]
+    if custom_fields is None or custom_fields:
+        parts.append(CUSTOM_FIELDS_PROJECTION)
+    return ','.join(parts), custom_fields
+
+
+def field_value(value):
+    """ Converts a JSON custom field value to what the XML API returns for it.
+    """
+    if value is None:
+        return None
+    if isinstance(value, list):
+        values = [field_value(v) for v in value]
+        values = [v for v in values if v is not None]
+        return values or None
+    if isinstance(value, dict):
+        for key in ('login', 'name', 'presentation', 'text'):
+            if value.get(key) is not None:
+                return value[key]
+        return None
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def field_attribute_type(custom_field):
+    """ Returns the xsi:type the XML API gives a custom field: MultiUserField for user
+        fields, CustomFieldValue for all others.
+    """
+    if 'User' in (custom_field.get('$type') or ''):
+        return 'MultiUserField'
+    value = custom_field.get('value')
+    values = value if isinstance(value, list) else [value]
+    if any(isinstance(v, dict) and (v.get('$type') == 'User' or 'login' in v) for v in values):
+        return 'MultiUserField'
+    return 'CustomFieldValue'
+
+
+def issue_from_json(data, connection=None, fields=None):
+    """ Builds youtrack.Issue from an /api/issues entity requested with issue_projection(fields).
+    """
+    issue = youtrack.Issue(None, connection)
+    for name in (DEFAULT_FIELDS if fields is None else fields):
+        if name in ISSUE_FIELDS:
+            value = ISSUE_FIELDS[name][1](data)
+            if value is not None:
+                issue[name] = value
+    for custom_field in data.get('customFields') or ():
+        name = custom_field.get('name')
+        value = field_value(custom_field.get('value'))
+        if name and value is not None:
+            issue[name] = value
+            issue._attribute_types[name] = field_attribute_type(custom_field)
+    return issue
@@ -0,0 +1,75 @@
+import asyncio
+import concurrent.futures
+import functools
+
+from youtrack.connection import Connection
+
+
+class AsyncConnection(object):
+    """ asyncio counterpart of Connection.
+        Every call runs the blocking Connection method on a worker thread with
+        its own pooled HTTP session, so up to `concurrency` requests are in
+        flight at once while the event loop stays free. Any number of
+        coroutines may await at the same time; the rest wait for a free slot.
+        Results are the same youtrack model objects Connection returns.
+    """
+    def __init__(self, url, login=None, password=None, proxy_info=None, token=None, concurrency=16,
+                 connection=None):
+        if concurrency < 1:
+            raise ValueError("Concurrency limit must be a positive number")
+        if connection is None:
+            connection = Connection(url, login, password, proxy_info, token, pool_size=concurrency)
+        self.connection = connection
+        self.concurrency = concurrency
+        # the workers are the concurrency limit, calls beyond it queue in the executor
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    async def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs))
+
+    async def getIssues(self, projectId, filter, after, max, lazy=False):
+        return await self._call(self.connection.getIssues, projectId, filter, after, max, lazy)
+
+    async def getIssuesJson(self, projectId, filter, after, max, fields=None):
+        return await self._call(self.connection.getIssuesJson, projectId, filter, after, max, fields)
+
+    async def getAllIssues(self, filter='', after=0, max=999999, withFields=()):
+        return await self._call(self.connection.getAllIssues, filter, after, max, withFields)
+
+    async def getComments(self, id):
+        return await self._call(self.connection.getComments, id)
+
+    async def getLinks(self, id, outwardOnly=False):
+        return await self._call(self.connection.getLinks, id, outwardOnly)
+
+    async def getWorkItems(self, issue_id):
+        return await self._call(self.connection.getWorkItems, issue_id)
+
+    async def executeCommand(self, issueId, command, comment=None, group=None, run_as=None,
+                             disable_notifications=False):
+        return await self._call(self.connection.executeCommand, issueId, command, comment, group, run_as,
+                                disable_notifications)
+
+    async def importIssues(self, projectId, assigneeGroup, issues, report=None):
+        return await self._call(self.connection.importIssues, projectId, assigneeGroup, issues, report)
+
+    async def importLinks(self, links):
+        return await self._call(self.connection.importLinks, links)
+
+    def close(self):
+        """ Waits for the running calls and stops the worker threads. Blocks, use
+            `async with` or aclose() from a coroutine.
+        """
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        # shut down on another thread so the event loop isn't blocked while calls finish
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
@@ -0,0 +1,147 @@
+import contextlib
+import threading
+import time
+
+from youtrack.xmlwriter import text
+
+# markup around a single field or attribute value in an import body
+FIELD_OVERHEAD = 40
+
+
+def estimate_size(item):
+    """ Rough number of bytes item takes in an /import request body.
+        Works with dicts, YouTrackObjects and lists of them.
+    """
+    if item is None:
+        return 0
+    if isinstance(item, (str, bytes)):
+        return len(item)
+    if isinstance(item, (list, tuple, set)):
+        return sum(FIELD_OVERHEAD + estimate_size(value) for value in item)
+    if hasattr(item, '__iter__') and hasattr(item, '__getitem__'):
+        return sum(FIELD_OVERHEAD + len(text(name)) + estimate_size(item[name]) for name in item)
+    return len(text(item))
+
+
+class AdaptiveBatcher(object):
+    """ Splits items for a bulk import endpoint into batches bounded by item count
+        and by estimated body size, and adapts both to the observed response times:
+        a batch slower than target_latency shrinks the next ones, a batch well
+        under it lets them grow again. The byte budget follows the measured
+        throughput (bytes per second * target_latency).
+        Limits always stay within [min_items, max_items] and [min_bytes, max_bytes];
+        an item larger than the byte budget goes out on its own.
+    """
+    def __init__(self, initial_items=100, min_items=1, max_items=500,
+                 min_bytes=64 * 1024, max_bytes=8 * 1024 * 1024, target_latency=10.0,
+                 growth=1.5, backoff_factor=0.5, smoothing=0.3, size_of=estimate_size,
+                 clock=time.monotonic):
+        if not 1 <= min_items <= initial_items <= max_items:
+            raise ValueError("Batch sizes should satisfy 1 <= min_items <= initial_items <= max_items")
+        if not 0 < min_bytes <= max_bytes:
+            raise ValueError("Byte limits should satisfy 0 < min_bytes <= max_bytes")
+        self.min_items = min_items
+        self.max_items = max_items
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.target_latency = target_latency
+        self.growth = growth
+        self.backoff_factor = backoff_factor
+        self.smoothing = smoothing
+        self.size_of = size_of
+        self._clock = clock
+        self._items = float(initial_items)
+        self._bytes = float(max_bytes)
+        self._throughput = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.failures = 0
+
+    @property
+    def item_limit(self):
+        with self._lock:
+            return int(self._items)
+
+    @property
+    def byte_limit(self):
+        with self._lock:
+            return int(self._bytes)
+
+    def split(self, items):
+        """ Yields lists of items. Limits are read again for every batch, so
+            observations recorded between batches apply to the next one.
+        """
+        for batch, size in self._split(items):
+            yield batch
+
+    def _split(self, items):
+        batch = []
+        batch_bytes = 0
+        for item in items:
+            size = self.size_of(item)
+            if batch and (len(batch) >= self.item_limit or batch_bytes + size > self.byte_limit):
+                yield batch, batch_bytes
+                batch = []
+                batch_bytes = 0
+            batch.append(item)
+            batch_bytes += size
+        if batch:
+            yield batch, batch_bytes
+
+    def observe(self, count, size, elapsed, failed=False):
+        """ Adapts the limits to a batch of count items and size bytes that took elapsed seconds.
+        """
+        with self._lock:
+            self.batches += 1
+            if failed:
+                self.failures += 1
+            if elapsed > 0 and size > 0 and not failed:
+                throughput = size / elapsed
+                if self._throughput is None:
+                    self._throughput = throughput
+                else:
+                    self._throughput += self.smoothing * (throughput - self._throughput)
+                self._bytes = self._throughput * self.target_latency
+            if failed or elapsed > self.target_latency:
+                self._items = max(count, self.min_items) * self.backoff_factor
+                self._bytes = min(self._bytes, size * self.backoff_factor)
+            elif elapsed < self.target_latency / 2 and count >= int(self._items):
+                self._items *= self.growth
+            self._items = min(max(self._items, self.min_items), self.max_items)
+            self._bytes = min(max(self._bytes, self.min_bytes), self.max_bytes)
+
+    @contextlib.contextmanager
+    def measure(self, count, size):
+        """ Observes the time spent in the with block on a batch of count items and size bytes.
+        """
+        started = self._clock()
+        try:
+            yield
+        except Exception:
+            self.observe(count, size, self._clock() - started, failed=True)
+            raise
+        self.observe(count, size, self._clock() - started)
+
+    def run(self, items, send, timer=False):
+        """ Calls send(batch) for every batch of items and returns the list of results.
+            With timer=True send is called as send(batch, timer) and only the time
+            spent in its `with timer:` block (the import request) is observed, so
+            work done around the request doesn't shrink the batches.
+        """
+        results = []
+        for batch, size in self._split(items):
+            measure = self.measure(len(batch), size)
+            if timer:
+                results.append(send(batch, measure))
+            else:
+                with measure:
+                    results.append(send(batch))
+        return results
+
+    def snapshot(self):
+        with self._lock:
+            return {'item_limit': int(self._items),
+                    'byte_limit': int(self._bytes),
+                    'throughput': self._throughput,
+                    'batches': self.batches,
+                    'failures': self.failures}
@@ -0,0 +1,59 @@
+import collections
+import threading
+import time
+
+MISSING = object()
+
+
+class MetadataCache(object):
+    """ Thread-safe LRU cache whose entries expire `ttl` seconds after they were stored.
+        Keys are tuples, e.g. ('bundle', 'enum', 'Priorities'), so related entries
+        can be dropped together with invalidate_prefix.
+    """
+    def __init__(self, ttl=300, max_size=1024, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError("Cache size must be a positive number")
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        prefix = tuple(prefix)
+        with self._lock:
+            for key in [k for k in self._entries if k[:len(prefix)] == prefix]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,86 @@
+import threading
+
+import youtrack
+
+# first build that takes the markdown field on import
+MARKDOWN_MIN_BUILD = 39406
+
+
+class ServerCapabilities(object):
+    """ What the server behind a Connection supports, asked for once and kept:
+        the build number, markdown support, per-project time tracking settings
+        and which REST endpoints exist.
+        Nothing is requested until it is needed; refresh() forgets what was learned.
+    """
+    def __init__(self, connection):
+        self._connection = connection
+        self._lock = threading.Lock()
+        self._build = None
+        self._time_tracking = {}
+        self._endpoints = {}
+
+    @property
+    def build(self):
+        with self._lock:
+            build = self._build
+        if build is None:
+            build = self._connection.getYouTrackBuildNumber()
+            with self._lock:
+                self._build = build
+                self._endpoints[self._connection.url + '/api/config'] = build > 0
+        return build
+
+    @property
+    def markdown(self):
+        return self.build > MARKDOWN_MIN_BUILD
+
+    def time_tracking(self, project_id):
+        """ Returns youtrack.ProjectTimeTrackingSettings of the project,
+            None if the server has no time tracking settings for it.
+        """
+        with self._lock:
+            if project_id in self._time_tracking:
+                return self._time_tracking[project_id]
+        settings = self._connection.getProjectTimeTrackingSettings(project_id)
+        with self._lock:
+            self._time_tracking[project_id] = settings
+        return settings
+
+    def supports(self, path):
+        """ Tells if a GET on path (relative to /rest or absolute) is not answered with 404.
+            Only use it with endpoints that are cheap to read.
+        """
+        with self._lock:
+            if path in self._endpoints:
+                return self._endpoints[path]
+        try:
+            response, content = self._connection._req('GET', path, ignoreStatus=404)
+            supported = response.status != 404
+        except youtrack.YouTrackException as e:
+            supported = e.response.status != 404
+        with self._lock:
+            self._endpoints[path] = supported
+        return supported
+
+    def refresh(self, project_id=None):
+        """ Forgets the time tracking settings of project_id, or everything if it is None.
+        """
+        with self._lock:
+            if project_id is not None:
+                self._time_tracking.pop(project_id, None)
+                return
+            self._build = None
+            self._time_tracking.clear()
+            self._endpoints.clear()
+
+    def to_dict(self):
+        with self._lock:
+            time_tracking = {}
+            for project_id, settings in self._time_tracking.items():
+                if settings is not None:
+                    settings = {'enabled': settings.Enabled, 'timeSpentField': settings.TimeSpentField}
+                time_tracking[project_id] = settings
+            return {'build': self._build,
+                    'markdown': None if self._build is None else self._build > MARKDOWN_MIN_BUILD,
+                    'time_tracking': time_tracking,
+                    'endpoints': dict(self._endpoints)}
@@ -0,0 +1,219 @@
+"""
+Column arrays built from a stream of issues, for vectorized reporting.
+
+Rows are appended one issue at a time into typed arrays (8 bytes per date or
+number, 4 bytes per categorical code), so a million issues can be turned into
+columns straight from Connection.iterAllIssues / iterIssues without keeping the
+Issue objects. The arrays are handed to NumPy without copying; NumPy is only
+needed for that step and for the aggregations (pip install numpy).
+"""
+
+import array
+
+import youtrack
+
+DATE_FIELDS = ('created', 'updated', 'resolved')
+NUMBER_FIELDS = ('numberInProject', 'votes', 'commentsCount')
+# project custom field types (without the [1]/[*] suffix) with a bounded set of values
+CATEGORICAL_FIELD_TYPES = frozenset(['enum', 'state', 'version', 'ownedField', 'build', 'user'])
+# every custom field comes as CustomFieldValue in /rest XML, only user fields have their own xsi:type
+USER_FIELD_XSI_TYPE = 'MultiUserField'
+CUSTOM_FIELD_XSI_TYPE = 'CustomFieldValue'
+
+# int64 minimum is NumPy's NaT
+MISSING_DATE = -2 ** 63
+MISSING_CODE = -1
+MULTI_VALUE_SEPARATOR = ', '
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy is required for column arrays, install it with 'pip install numpy'")
+    return numpy
+
+
+class Categorical(object):
+    """ Dictionary encoded column: codes index into categories, MISSING_CODE marks no value.
+        Multiple values of a field are joined into one category.
+    """
+    def __init__(self, rows=0):
+        self.codes = array.array('i', [MISSING_CODE]) * rows
+        self.categories = []
+        self._index = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(MISSING_CODE)
+            return
+        if isinstance(value, list):
+            value = MULTI_VALUE_SEPARATOR.join(value)
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+
+class IssueColumns(object):
+    """ Columns of issue fields. Dates are epoch milliseconds, numbers are floats with
+        NaN for missing values, categorical fields are dictionary encoded.
+        The NumPy arrays returned share memory with the columns; no rows can be
+        appended while any of them is alive.
+        With categories=None every custom field of an enum, state, version, owned
+        field, build or user type (see CATEGORICAL_FIELD_TYPES) becomes a categorical
+        column as it is seen, plus reporterName. Field types are looked up once per
+        project with getProjectCustomField on connection, or on the issue's own
+        connection; without one, only user fields are recognized. String, text, date
+        and number custom fields are never encoded, pass them in categories to do so.
+    """
+    def __init__(self, dates=DATE_FIELDS, numbers=NUMBER_FIELDS, categories=None, ids=True, connection=None):
+        self.dates = dict((name, array.array('q')) for name in dates)
+        self.numbers = dict((name, array.array('d')) for name in numbers)
+        self.connection = connection
+        self._auto_categories = categories is None
+        # (project, field name) -> whether the field is categorical
+        self._categorical_fields = {}
+        self.categories = dict((name, Categorical()) for name in (['reporterName'] if categories is None else categories))
+        self.ids = [] if ids else None
+        self.rows = 0
+
+    @classmethod
+    def from_issues(cls, issues, **kwargs):
+        columns = cls(**kwargs)
+        columns.extend(issues)
+        return columns
+
+    def extend(self, issues):
+        for issue in issues:
+            self.append(issue)
+        return self
+
+    def append(self, issue):
+        if type(issue) is youtrack.Issue:
+            get = issue.__dict__.get
+        else:
+            # LazyIssue decodes on attribute access, CompactIssue has no __dict__
+            get = lambda name: getattr(issue, name, None)
+        if self._auto_categories:
+            for name, attribute_type in issue._attribute_types.items():
+                if name not in self.categories and self._is_categorical(issue, get, name, attribute_type):
+                    self.categories[name] = Categorical(self.rows)
+        for name, column in self.dates.items():
+            column.append(self._millis(get(name)))
+        for name, column in self.numbers.items():
+            column.append(self._number(get(name)))
+        for name, column in self.categories.items():
+            column.append(get(name))
+        if self.ids is not None:
+            self.ids.append(get('id'))
+        self.rows += 1
+
+    def _is_categorical(self, issue, get, name, attribute_type):
+        if attribute_type == USER_FIELD_XSI_TYPE:
+            return True
+        if attribute_type != CUSTOM_FIELD_XSI_TYPE:
+            return False
+        project = get('projectShortName') or (get('id') or '').rpartition('-')[0]
+        key = (project, name)
+        categorical = self._categorical_fields.get(key)
+        if categorical is None:
+            categorical = self._categorical_fields[key] = self._field_type(issue, project, name) in \
+                CATEGORICAL_FIELD_TYPES
+        return categorical
+
+    def _field_type(self, issue, project, name):
+        connection = self.connection or getattr(issue, 'youtrack', None)
+        if connection is None or not project:
+            return None
+        try:
+            field = connection.getProjectCustomField(project, name)
+        except youtrack.YouTrackException:
+            return None
+        return getattr(field, 'type', '').split('[', 1)[0]
+
+    @staticmethod
+    def _millis(value):
+        if value is None:
+            return MISSING_DATE
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return MISSING_DATE
+
+    @staticmethod
+    def _number(value):
+        if value is None:
+            return float('nan')
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float('nan')
+
+    def date(self, name):
+        """ Returns the field as a NumPy datetime64[ms] array, NaT where it is missing.
+        """
+        numpy = _numpy()
+        return numpy.frombuffer(self.dates[name], dtype=numpy.int64).view('datetime64[ms]')
+
+    def number(self, name):
+        numpy = _numpy()
+        return numpy.frombuffer(self.numbers[name], dtype=numpy.float64)
+
+    def codes(self, name):
+        """ Returns the int32 codes of a categorical field; category_values(name)[code] is the value.
+        """
+        numpy = _numpy()
+        return numpy.frombuffer(self.categories[name].codes, dtype=numpy.int32)
+
+    def category_values(self, name):
+        return self.categories[name].categories
+
+    def to_numpy(self):
+        """ Returns {field: array}; categorical fields map to (codes, categories).
+        """
+        result = dict((name, self.date(name)) for name in self.dates)
+        result.update((name, self.number(name)) for name in self.numbers)
+        result.update((name, (self.codes(name), self.category_values(name))) for name in self.categories)
+        return result
+
+    def duration(self, start='created', end='resolved'):
+        """ Returns end - start in hours as float64, NaN where either is missing.
+        """
+        numpy = _numpy()
+        start_values = numpy.frombuffer(self.dates[start], dtype=numpy.int64)
+        end_values = numpy.frombuffer(self.dates[end], dtype=numpy.int64)
+        result = (end_values - start_values) / 3600000.0
+        result[(start_values == MISSING_DATE) | (end_values == MISSING_DATE)] = numpy.nan
+        return result
+
+    def aggregate_by(self, values, category):
+        """ Groups values (a float array with one entry per row) by a categorical field.
+            Returns {category value: (count, mean, median)} ignoring missing entries.
+        """
+        numpy = _numpy()
+        values = numpy.asarray(values, dtype=numpy.float64)
+        codes = self.codes(category)
+        valid = (codes != MISSING_CODE) & ~numpy.isnan(values)
+        codes = codes[valid]
+        values = values[valid]
+        names = self.category_values(category)
+        counts = numpy.bincount(codes, minlength=len(names))
+        sums = numpy.bincount(codes, weights=values, minlength=len(names))
+        order = numpy.lexsort((values, codes))
+        sorted_values = values[order]
+        ends = numpy.cumsum(counts)
+        result = {}
+        for code, name in enumerate(names):
+            count = int(counts[code])
+            if not count:
+                continue
+            group = sorted_values[ends[code] - count:ends[code]]
+            result[name] = (count, float(sums[code] / count), float(numpy.median(group)))
+        return result
+
+    def time_to_resolve_by(self, category):
+        """ Hours from created to resolved, aggregated per value of a categorical field.
+        """
+        return self.aggregate_by(self.duration('created', 'resolved'), category)
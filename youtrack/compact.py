@@ -0,0 +1,187 @@
+"""
+Compact issue records for large in-memory result sets.
+
+A CompactIssue keeps only a reference to the schema of its project and a list
+of values; field names, their positions and xsi:type attribute types live once
+in the shared IssueSchema. Short values that repeat a lot across issues
+(states, priorities, logins) are interned.
+"""
+
+import sys
+import threading
+
+import youtrack
+
+# values of these fields are (nearly) unique per issue, interning them only fills the table
+UNIQUE_FIELDS = frozenset(['id', 'entityId', 'numberInProject', 'summary', 'description',
+                           'created', 'updated', 'resolved'])
+MAX_INTERNED_LENGTH = 32
+
+_ABSENT = object()
+
+
+class IssueSchema(object):
+    """ Field names and attribute types shared by the issues of one project.
+        Fields are only ever appended, so a position stays valid for the schema's lifetime.
+    """
+    def __init__(self, project=None, connection=None):
+        self.project = project
+        self.connection = connection
+        self.names = []
+        self.index = {}
+        self.types = {}
+        self._lock = threading.Lock()
+
+    def position(self, name):
+        position = self.index.get(name)
+        if position is None:
+            with self._lock:
+                position = self.index.get(name)
+                if position is None:
+                    name = sys.intern(name)
+                    position = len(self.names)
+                    self.names.append(name)
+                    self.index[name] = position
+        return position
+
+    def value(self, name, value):
+        if isinstance(value, str) and len(value) <= MAX_INTERNED_LENGTH and name not in UNIQUE_FIELDS:
+            return sys.intern(value)
+        if isinstance(value, list):
+            return [self.value(name, v) for v in value]
+        return value
+
+
+class IssueSchemas(object):
+    """ IssueSchema per project short name.
+    """
+    def __init__(self, connection=None):
+        self.connection = connection
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def get(self, project):
+        with self._lock:
+            schema = self._schemas.get(project)
+            if schema is None:
+                schema = self._schemas[project] = IssueSchema(project, self.connection)
+            return schema
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._schemas.values()))
+
+
+class CompactIssue(object):
+    """ Read-mostly stand-in for youtrack.Issue. Fields are available as attributes
+        and through the same __getitem__/__iter__ protocol, so the records can be
+        passed to Connection.importIssues as they are.
+    """
+    __slots__ = ('schema', 'values')
+
+    def __init__(self, schema, values=None):
+        object.__setattr__(self, 'schema', schema)
+        object.__setattr__(self, 'values', values if values is not None else [])
+
+    @classmethod
+    def from_object(cls, obj, schema):
+        """ Copies the fields of a YouTrackObject (or a dict) into a CompactIssue.
+        """
+        compact = cls(schema)
+        attrs = obj if isinstance(obj, dict) else obj.__dict__
+        for name, value in attrs.items():
+            if name in ('youtrack', '_attribute_types'):
+                continue
+            compact[name] = value
+        for name, attribute_type in getattr(obj, '_attribute_types', {}).items():
+            schema.types.setdefault(sys.intern(name), attribute_type)
+        return compact
+
+    @property
+    def youtrack(self):
+        return self.schema.connection
+
+    def getComments(self):
+        # like Issue.getComments, importIssues reads the comments through it
+        if 'comments' not in self:
+            self['comments'] = self.schema.connection.getComments(self.id)
+        return self['comments']
+
+    @property
+    def _attribute_types(self):
+        return self.schema.types
+
+    def __getitem__(self, key):
+        position = self.schema.index.get(key)
+        if position is None or position >= len(self.values) or self.values[position] is _ABSENT:
+            raise KeyError(key)
+        return self.values[position]
+
+    def __setitem__(self, key, value):
+        position = self.schema.position(key)
+        values = self.values
+        if position >= len(values):
+            values.extend([_ABSENT] * (position + 1 - len(values)))
+        values[position] = self.schema.value(key, value)
+
+    def __delitem__(self, key):
+        position = self.schema.index.get(key)
+        if position is None or position >= len(self.values) or self.values[position] is _ABSENT:
+            raise KeyError(key)
+        self.values[position] = _ABSENT
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in CompactIssue.__slots__:
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in CompactIssue.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __iter__(self):
+        # same selection as YouTrackObject.__iter__
+        names = self.schema.names
+        for position, value in enumerate(self.values):
+            if value is _ABSENT:
+                continue
+            if isinstance(value, str) or isinstance(value, list) or getattr(value, '__iter__', False):
+                yield names[position]
+
+    def items(self):
+        names = self.schema.names
+        return [(names[position], value) for position, value in enumerate(self.values) if value is not _ABSENT]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def to_issue(self):
+        """ Returns a regular youtrack.Issue with the same fields.
+        """
+        issue = youtrack.Issue(None, self.schema.connection)
+        for name, value in self.items():
+            issue[name] = value
+            if name in self.schema.types:
+                issue._attribute_types[name] = self.schema.types[name]
+        return issue
+
+    def __repr__(self):
+        return ''.join('{0}={1}\n'.format(name, value) for name, value in self.items())
@@ -1,51 +1,142 @@
 import calendar
+import concurrent.futures
+import contextlib
 import functools
+import gzip
+import http.client
 import httplib2
+import io
 import json
+import queue
 import re
 import sys
-import tempfile
+import threading
 import time
 import urllib.request, urllib.parse, urllib.error
 from xml.dom import Node
 from xml.dom import minidom
+from xml.dom import pulldom
 from xml.sax.saxutils import escape, quoteattr
 import datetime
 import youtrack
+from youtrack import api
+from youtrack.cache import MetadataCache, MISSING
+from youtrack.capabilities import ServerCapabilities
+from youtrack.compact import CompactIssue, IssueSchemas
+from youtrack.decoder import decode_issue
+from youtrack.importreport import ImportReport
+from youtrack.metrics import CompressionStats, MetricsRegistry
+from youtrack.multipart import CHUNK_SIZE, MultipartEncoder
+from youtrack import xmlwriter
+from youtrack.retry import RetryPolicy
+
+def _partial_content(error):
+    """ Returns the bytes an IncompleteRead carries. A broken chunked response raises one
+        for the chunks read so far, caused by another for the data of the current chunk.
+    """
+    parts = []
+    while isinstance(error, http.client.IncompleteRead):
+        parts.append(error.partial)
+        error = error.__cause__
+    return b''.join(parts)
+
 
 def relogin_on_401(f):
     @functools.wraps(f)
     def wrapped(self, *args, **kwargs):
-        attempts = 10
-        while attempts:
-            try:
-                return f(self, *args, **kwargs)
-            except youtrack.YouTrackException as e:
-                if e.response.status not in (401, 403, 500, 504):
-                    raise e
-                if e.response.status == 504:
-                    time.sleep(30)
-                elif self._last_credentials is not None:
-                    self._login(*self._last_credentials)
-                else:
-                    break
-                attempts -= 1
-        return f(self, *args, **kwargs)
+        sent = [None]
+
+        def attempt():
+            # remember the auth headers of the attempt, see Connection._relogin
+            sent[0] = self.headers
+            return f(self, *args, **kwargs)
+        return self.retry_policy.call(attempt, lambda: self._relogin(sent[0]))
     return wrapped
 
 
+class HttpPool(object):
+    """ Pool of keep-alive httplib2.Http sessions.
+        httplib2.Http is not thread-safe, so every request checks a session out
+        of the pool and returns it afterwards. At most `size` sessions are
+        created; callers block while all of them are busy.
+    """
+    def __init__(self, size=1, proxy_info=None):
+        if size < 1:
+            raise ValueError("Pool size must be a positive number")
+        self.size = size
+        self._proxy_info = proxy_info
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        if self._proxy_info is None:
+            return httplib2.Http(disable_ssl_certificate_validation=True)
+        return httplib2.Http(disable_ssl_certificate_validation=True,
+                             proxy_info=self._proxy_info)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._create()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def release(self, http):
+        self._idle.put(http)
+
+    @contextlib.contextmanager
+    def session(self):
+        http = self.acquire()
+        try:
+            yield http
+        finally:
+            self.release(http)
+
+    def request(self, *args, **kwargs):
+        with self.session() as http:
+            return http.request(*args, **kwargs)
+
+
 class Connection(object):
-    def __init__(self, url, login=None, password=None, proxy_info=None, token=None):
-        if proxy_info is None:
-            self.http = httplib2.Http(disable_ssl_certificate_validation=True)
-        else:
-            self.http = httplib2.Http(disable_ssl_certificate_validation=True,
-                                      proxy_info=proxy_info)
+    def __init__(self, url, login=None, password=None, proxy_info=None, token=None, pool_size=8):
+        # All threads share one pool and therefore one set of auth headers
+        self.http = HttpPool(pool_size, proxy_info)
 
         self.url = url.rstrip('/')
         self.baseUrl = self.url + "/rest"
+        self._root_path = urllib.parse.urlsplit(self.url).path
         self.headers = dict()
         self._last_credentials = None
+        self._login_lock = threading.Lock()
+        self.metadata_cache = None
+        # use RetryPolicy(circuit_breaker=CircuitBreaker()) to fail fast on a struggling server
+        self.retry_policy = RetryPolicy()
+        # youtrack.throttle.Governor, share one instance between connections to the same server
+        self.governor = None
+        self.metrics = MetricsRegistry()
+        # httplib2 asks for gzip/deflate responses and decodes them; set to False to
+        # request identity encoding instead. Request bodies are only gzipped when
+        # enabled, since not every server accepts them
+        self.compress_responses = True
+        self.compress_requests = False
+        self.compression_threshold = 64 * 1024
+        self.compression_stats = CompressionStats()
+        # build, markdown and time tracking support, fetched on first use
+        self.capabilities = ServerCapabilities(self)
+        # field names and types shared by the CompactIssue records of each project
+        self.issue_schemas = IssueSchemas(self)
 
         if token:
             self.set_auth_token(token)
@@ -56,6 +147,57 @@ class Connection(object):
         if token:
             self.headers = {'Authorization': 'Bearer ' + token}
 
+    def enableMetadataCache(self, ttl=300, max_size=1024):
+        """ Caches custom field, project custom field and bundle lookups for ttl seconds.
+            Writes made through this connection invalidate the affected entries.
+        """
+        self.metadata_cache = MetadataCache(ttl, max_size)
+        return self.metadata_cache
+
+    def disableMetadataCache(self):
+        self.metadata_cache = None
+
+    @staticmethod
+    def _metadata_key(*parts):
+        return tuple(p.decode('utf-8') if isinstance(p, bytes) else p for p in parts)
+
+    def _cached(self, key, loader):
+        cache = self.metadata_cache
+        if cache is None:
+            return loader()
+        value = cache.get(key)
+        if value is MISSING:
+            try:
+                value = loader()
+            except youtrack.YouTrackException as e:
+                # remember missing entities too, the importer probes for them a lot
+                if e.response.status != 404:
+                    raise e
+                value = e.with_traceback(None)
+            cache.put(key, value)
+        if isinstance(value, youtrack.YouTrackException):
+            # a fresh instance per raise, threads would share the traceback of a cached one
+            error = value.__class__.__new__(value.__class__)
+            error.__dict__.update(value.__dict__)
+            error.args = value.args
+            raise error
+        return value
+
+    def _invalidate(self, *parts):
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate_prefix(self._metadata_key(*parts))
+
+    def _relogin(self, failed_headers=None):
+        """ Logs in again after a 401 got with failed_headers. Threads share the session,
+            so only the first of them logs in, the others retry with its headers.
+        """
+        if self._last_credentials is None:
+            return False
+        with self._login_lock:
+            if failed_headers is None or self.headers is failed_headers:
+                self._login(*self._last_credentials)
+        return True
+
     def _login(self, login, password):
         if login is None:
             login = ''
@@ -86,8 +228,11 @@ class Connection(object):
         return re.compile(b'[%s]' % ''.join(_illegal_ranges))
 
     @relogin_on_401
-    def _req(self, method, url, body=None, ignoreStatus=None, content_type=None):
+    def _req(self, method, url, body=None, ignoreStatus=None, content_type=None, accept=None):
         headers = self.headers
+        if accept is not None:
+            headers = headers.copy()
+            headers['Accept'] = accept
         if method == 'PUT' or method == 'POST':
             headers = headers.copy()
             if body:
@@ -99,23 +244,26 @@ class Connection(object):
                 #    body = re.sub(self.__get_illegal_xml_chars_re(), b'', body)
 
                 headers['Content-Type'] = content_type
+                if self.compress_requests and len(body) >= self.compression_threshold:
+                    raw_body = body.encode('utf-8') if isinstance(body, str) else body
+                    body = gzip.compress(raw_body)
+                    headers['Content-Encoding'] = 'gzip'
                 headers['Content-Length'] = len(body)
         elif method == 'GET' and content_type is not None:
             headers = headers.copy()
             headers['Accept'] = content_type
 
-        if url.startswith('http'):
-            response, content = self.http.request(
-                url,
-                method,
-                headers=headers,
-                body=body)
-        else:
-            response, content = self.http.request(
-                (self.baseUrl + url),
-                method,
-                headers=headers,
-                body=body)
+        uri = url if url.startswith('http') else self.baseUrl + url
+        response, content = self._dispatch(method, uri, headers, body)
+        if 'Content-Encoding' in headers:
+            if response.status == 415:
+                # server does not take compressed bodies, send this one again as is and stop compressing
+                self.compress_requests = False
+                del headers['Content-Encoding']
+                headers['Content-Length'] = len(raw_body)
+                response, content = self._dispatch(method, uri, headers, raw_body)
+            else:
+                self.compression_stats.record_request(len(raw_body), len(body))
 
         #if response.get('content-type', '').lower().find('/xml') != -1:
         #    # Remove invalid xml/utf-8 data
@@ -131,9 +279,37 @@ class Connection(object):
 
         return response, content
 
-    def _reqXml(self, method, url, body=None, ignoreStatus=None):
+    def _dispatch(self, method, uri, headers, body):
+        if not self.compress_responses:
+            headers = dict(headers)
+            headers['Accept-Encoding'] = 'identity'
+        governor = self.governor
+        if governor is None:
+            return self._send(method, uri, headers, body)
+        with governor.request(method):
+            response, content = self._send(method, uri, headers, body)
+        governor.record(method, response.status)
+        return response, content
+
+    def _send(self, method, uri, headers, body):
+        path = urllib.parse.urlsplit(uri).path
+        if path.startswith(self._root_path):
+            path = path[len(self._root_path):]
+        started = time.monotonic()
+        try:
+            response, content = self.http.request(uri, method, headers=headers, body=body)
+        except Exception:
+            self.metrics.record(method, path, None, time.monotonic() - started, body)
+            raise
+        self.metrics.record(method, path, response.status, time.monotonic() - started, body, content)
+        # httplib2 has decoded the body already and keeps the original encoding under '-content-encoding'
+        if response.get('-content-encoding') in ('gzip', 'deflate'):
+            self.compression_stats.record_encoded_response()
+        return response, content
+
+    def _reqXml(self, method, url, body=None, ignoreStatus=None, accept=None):
         response, content = self._req(
-            method, url, body, ignoreStatus, "application/xml")
+            method, url, body, ignoreStatus, "application/xml", accept)
         if "content-type" in response:
             if response["content-type"].find("/xml") != -1 and content:
                 try:
@@ -153,14 +329,45 @@ class Connection(object):
         else:
             return content
 
+    @staticmethod
+    def _iterElements(content, factory):
+        """ Yields factory(element) for every child of the document element.
+            Only one child subtree is expanded at a time and it is dropped as
+            soon as the consumer moves on, so the full DOM is never built.
+        """
+        events = pulldom.parse(io.BytesIO(content))
+        depth = 0
+        for event, node in events:
+            if event == pulldom.START_ELEMENT:
+                if depth == 1:
+                    events.expandNode(node)
+                    yield factory(node)
+                else:
+                    depth += 1
+            elif event == pulldom.END_ELEMENT:
+                depth -= 1
+
+    def _mapConcurrently(self, func, items):
+        """ Returns [func(item) for item in items], running up to pool size calls at once.
+        """
+        items = list(items)
+        workers = min(self.http.size, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
     def _get(self, url):
         return self._reqXml('GET', url)
 
     def _put(self, url):
         return self._reqXml('PUT', url, '<empty/>\n\n')
 
-    def getIssue(self, id):
-        return youtrack.Issue(self._get("/issue/" + id), self)
+    def getIssue(self, id, lazy=False):
+        """ With lazy, returns youtrack.LazyIssue, which decodes fields on first access.
+        """
+        issue_class = youtrack.LazyIssue if lazy else decode_issue
+        return issue_class(self._get("/issue/" + id), self)
 
     def createIssue(self, project, assignee, summary, description, priority=None, type=None, subsystem=None, state=None,
                     affectsVersion=None,
@@ -207,19 +414,123 @@ class Connection(object):
         xml = minidom.parseString(content)
         return [youtrack.Attachment(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
 
-    def getAttachmentContent(self, url):
-        f = urllib.request.urlopen(urllib.request.Request(self.url + url, headers=self.headers))
+    def getAttachmentContent(self, url, offset=0, validator=None):
+        """ With validator, the ETag or Last-Modified of an earlier response, the range
+            is only served if the attachment is unchanged; otherwise all of it is sent.
+        """
+        if isinstance(url, bytes):
+            url = url.decode('utf-8')
+        headers = self.headers
+        if offset:
+            headers = headers.copy()
+            headers['Range'] = 'bytes=%d-' % offset
+            if validator is not None:
+                headers['If-Range'] = validator
+        f = urllib.request.urlopen(urllib.request.Request(self.url + url, headers=headers))
         return f
 
+    def downloadAttachment(self, url, destination, chunk_size=CHUNK_SIZE, resume=False, max_retries=5,
+                           retry_delay=2, progress=None):
+        """ Streams attachment content to destination, a file path or a binary file object.
+            A dropped connection is resumed with a Range request, up to max_retries times,
+            when the size is known; a broken response of unknown size raises IOError.
+            Resumed requests carry If-Range, so a changed attachment is fetched again whole.
+            An existing file at the destination path is overwritten. With resume=True it is
+            taken for an earlier partial download of this same url and completed instead;
+            only use it when nothing else writes to that path.
+            progress(received, total) is called after every chunk, total may be None.
+            Returns a dict with the size, downloaded bytes, elapsed seconds,
+            throughput (bytes per second) and number of resumed requests.
+        """
+        own_file = isinstance(destination, str)
+        f = open(destination, 'ab' if resume else 'wb') if own_file else destination
+        started = time.monotonic()
+        try:
+            base = 0 if own_file else f.tell()
+            offset = f.tell() - base
+            downloaded = 0
+            total = None
+            validator = None
+            resumes = 0
+            while True:
+                try:
+                    response = self.getAttachmentContent(url, offset, validator)
+                except urllib.error.HTTPError as e:
+                    if e.code == 416 and e.headers.get('content-range', '') == 'bytes */%d' % offset:
+                        # already complete
+                        total = offset
+                        break
+                    raise e
+                except OSError:
+                    response = None
+                read_failed = False
+                if response is not None:
+                    with response:
+                        if offset and response.status != 206:
+                            # the range was ignored, start over
+                            f.seek(base)
+                            f.truncate()
+                            offset = 0
+                        validator = response.headers.get('etag') or response.headers.get('last-modified')
+                        content_range = response.headers.get('content-range', '')
+                        if '/' in content_range and not content_range.endswith('/*'):
+                            total = int(content_range.rsplit('/', 1)[1])
+                        elif response.headers.get('content-length') is not None:
+                            total = offset + int(response.headers.get('content-length'))
+                        try:
+                            while True:
+                                chunk = response.read(chunk_size)
+                                if not chunk:
+                                    break
+                                f.write(chunk)
+                                offset += len(chunk)
+                                downloaded += len(chunk)
+                                if progress is not None:
+                                    progress(offset, total)
+                        except (OSError, http.client.HTTPException) as e:
+                            read_failed = True
+                            # keep what arrived before the stream broke
+                            partial = _partial_content(e)
+                            if partial:
+                                f.write(partial)
+                                offset += len(partial)
+                                downloaded += len(partial)
+                    if total is None:
+                        if read_failed:
+                            raise IOError('Download of attachment [%s] broke off after %d bytes of unknown size' %
+                                          (url, offset))
+                        break
+                    if offset == total:
+                        break
+                    if offset > total:
+                        raise IOError('Attachment [%s] is larger than announced: %d of %d bytes' % (url, offset, total))
+                if resumes >= max_retries:
+                    raise IOError('Download of attachment [%s] stopped at %d of %s bytes' % (url, offset, total))
+                resumes += 1
+                time.sleep(retry_delay)
+            f.flush()
+        finally:
+            if own_file:
+                f.close()
+        elapsed = time.monotonic() - started
+        return {'size': offset,
+                'downloaded': downloaded,
+                'seconds': elapsed,
+                'throughput': downloaded / elapsed if elapsed > 0 else None,
+                'resumes': resumes}
+
     def deleteAttachment(self, issue_id, attachment_id):
         return self._req('DELETE', '/issue/%s/attachment/%s' % (issue_id, attachment_id))
 
-    def createAttachmentFromAttachment(self, issueId, a):
+    def createAttachmentFromAttachment(self, issueId, a, raise_errors=False):
+        """ Copies attachment a (from getAttachments of another server) to issueId.
+            HTTP errors are printed and None is returned, unless raise_errors is set.
+        """
         try:
             content = a.getContent()
             contentLength = None
-            if 'content-length' in content.headers.dict:
-                contentLength = int(content.headers.dict['content-length'])
+            if content.headers.get('content-length') is not None:
+                contentLength = int(content.headers.get('content-length'))
             print('Importing attachment for issue ', issueId)
             try:
                 print('Name: ', a.name)
@@ -231,7 +542,7 @@ class Connection(object):
                 print(e)
             return self.importAttachment(issueId, a.name, content, a.authorLogin,
                 contentLength=contentLength,
-                contentType=content.info().type,
+                contentType=content.info().get_content_type(),
                 created=a.created if hasattr(a, 'created') else None,
                 group=a.group if hasattr(a, 'group') else '')
         except urllib.error.HTTPError as e:
@@ -256,6 +567,8 @@ class Connection(object):
                 print("Attachment URL: ", attach_url)
             except Exception:
                 pass
+            if raise_errors:
+                raise e
         except Exception as e:
             try:
                 print(content.geturl())
@@ -268,21 +581,12 @@ class Connection(object):
 
     def _process_attachments(self, authorLogin, content, contentLength, contentType, created, group, issueId, name,
                              url_prefix='/issue/'):
-        if contentType is not None:
-            content.contentType = contentType
-        if contentLength is not None:
-            content.contentLength = contentLength
-        elif not isinstance(content, file):
-            tmp = tempfile.NamedTemporaryFile(mode='w+b')
-            tmp.write(content.read())
-            tmp.flush()
-            tmp.seek(0)
-            content = tmp
-
-        #post_data = {'attachment': content}
-        post_data = {name: content}
+        # the file is streamed straight from content, chunked if its size is unknown
+        post_data = MultipartEncoder(name, name, content, contentType, contentLength)
         headers = self.headers.copy()
-        #headers['Content-Type'] = contentType
+        headers['Content-Type'] = post_data.content_type
+        if post_data.length is not None:
+            headers['Content-Length'] = str(post_data.length)
         # name without extension to workaround: http://youtrack.jetbrains.net/issue/JT-6110
         params = {#'name': os.path.splitext(name)[0],
                   'authorLogin': authorLogin.encode('utf-8'),
@@ -295,11 +599,11 @@ class Connection(object):
             try:
                 params['created'] = self.getIssue(issueId).created
             except youtrack.YouTrackException:
-                params['created'] = str(calendar.timegm(datetime.now().timetuple()) * 1000)
+                params['created'] = str(calendar.timegm(datetime.datetime.now().timetuple()) * 1000)
 
         url = self.baseUrl + url_prefix + issueId + "/attachment?" + urllib.parse.urlencode(params)
         r = urllib.request.Request(url,
-            headers=headers, data=post_data)
+            headers=headers, data=iter(post_data), method='POST')
         #r.set_proxy('localhost:8888', 'http')
         try:
             res = urllib.request.urlopen(r)
@@ -360,15 +664,8 @@ class Connection(object):
         """
         if len(users) <= 0: return
 
-        known_attrs = ('login', 'fullName', 'email', 'jabber')
-
-        xml = '<list>\n'
-        for u in users:
-            xml += '  <user ' + "".join(k + '=' + quoteattr(u[k]) + ' ' for k in u if k in known_attrs) + '/>\n'
-        xml += '</list>'
+        xml = xmlwriter.users_document(users)
         #TODO: convert response xml into python objects
-        if isinstance(xml, str):
-            xml = xml.encode('utf-8')
         return self._reqXml('PUT', '/import/users', xml, 400).toxml()
 
     def importIssuesXml(self, projectId, assigneeGroup, xml):
@@ -382,23 +679,21 @@ class Connection(object):
             Example: importLinks([{'login':'vadim', 'fullName':'vadim', 'email':'eee@ss.com', 'jabber':'fff@fff.com'},
                                   {'login':'maxim', 'fullName':'maxim', 'email':'aaa@ss.com', 'jabber':'www@fff.com'}])
         """
-        xml = '<list>\n'
-        for l in links:
-            # ignore typeOutward and typeInward returned by getLinks()
-            xml += '  <link ' + "".join(attr + '=' + quoteattr(l[attr]) +
-                                        ' ' for attr in l if attr not in ['typeInward', 'typeOutward']) + '/>\n'
-        xml += '</list>'
+        # ignore typeOutward and typeInward returned by getLinks()
+        xml = xmlwriter.links_document(links)
         #TODO: convert response xml into python objects
         res = self._reqXml('PUT', '/import/links', xml, 400)
         return res.toxml() if hasattr(res, "toxml") else res
 
-    def importIssues(self, projectId, assigneeGroup, issues):
+    def importIssues(self, projectId, assigneeGroup, issues, report=None):
         """ Import issues, returns import result (http://confluence.jetbrains.net/display/YTD2/Import+Issues)
             Accepts retrun of getIssues()
             Example: importIssues([{'numberInProject':'1', 'summary':'some problem', 'description':'some description', 'priority':'1',
                                     'fixedVersion':['1.0', '2.0'],
                                     'comment':[{'author':'yamaxim', 'text':'comment text', 'created':'1267030230127'}]},
                                    {'numberInProject':'2', 'summary':'some problem', 'description':'some description', 'priority':'1'}])
+            Issues the server refuses are collected in report (youtrack.importreport.ImportReport);
+            without one, a summary of them is written to stderr.
         """
         if len(issues) <= 0:
             return
@@ -408,110 +703,78 @@ class Connection(object):
                       'reporterFullName', 'links', 'attachments', 'jiraId',
                       'entityId', 'tags', 'sprint', 'wikified']
 
-        tt_settings = self.getProjectTimeTrackingSettings(projectId)
+        tt_settings = self.capabilities.time_tracking(projectId)
         if tt_settings and tt_settings.Enabled and tt_settings.TimeSpentField:
             bad_fields.append(tt_settings.TimeSpentField)
 
-        if not self.isMarkdownSupported():
+        if not self.capabilities.markdown:
             bad_fields.append('markdown')
 
-        xml = '<issues>\n'
-        issue_records = dict([])
+        own_report = report is None
+        if own_report:
+            report = ImportReport()
 
+        # results come back by numberInProject, issues without one can't be told apart
+        numbered = []
         for issue in issues:
-            record = ""
-            record += '  <issue>\n'
-
-            comments = None
-            if getattr(issue, "getComments", None):
-                comments = issue.getComments()
-
-            for issueAttr in issue:
-                attrValue = issue[issueAttr]
-                if attrValue is None:
-                    continue
-                if isinstance(attrValue, str):
-                    attrValue = attrValue.encode('utf-8')
-                if isinstance(issueAttr, str):
-                    issueAttr = issueAttr.encode('utf-8')
-                if issueAttr == 'comments':
-                    comments = attrValue
-                else:
-                    # ignore bad fields from getIssue()
-                    if issueAttr not in bad_fields:
-                        record += '    <field name="' + issueAttr + '">\n'
-                        if isinstance(attrValue, list) or getattr(attrValue, '__iter__', False):
-                            for v in attrValue:
-                                if isinstance(v, str):
-                                    v = v.encode('utf-8')
-                                record += '      <value>' + escape(v.strip()) + '</value>\n'
-                        else:
-                            record += '      <value>' + escape(attrValue.strip()) + '</value>\n'
-                        record += '    </field>\n'
-
-            if comments:
-                for comment in comments:
-                    record += '    <comment'
-                    for ca in comment:
-                        val = comment[ca]
-                        if isinstance(ca, str):
-                            ca = ca.encode('utf-8')
-                        if isinstance(val, str):
-                            val = val.encode('utf-8')
-                        record += ' ' + ca + '=' + quoteattr(val, {"\n" : "&#xA;"})
-                    record += '/>\n'
-
-            record += '  </issue>\n'
-            xml += record
-            issue_records[issue.numberInProject] = record
-
-        xml += '</issues>'
-
-        #print xml
-        #TODO: convert response xml into python objects
-
-        if isinstance(xml, str):
-            xml = xml.encode('utf-8')
+            if xmlwriter.get(issue, 'numberInProject') is not None:
+                numbered.append(issue)
+            else:
+                writer = xmlwriter.XmlWriter()
+                xmlwriter.write_issue(writer, issue, bad_fields)
+                report.add_failure(None, 'Issue has no numberInProject', writer.getvalue().decode('utf-8'))
 
-        if isinstance(assigneeGroup, str):
-            assigneeGroup = assigneeGroup.encode('utf-8')
+        #TODO: convert response xml into python objects
 
         url = '/import/' + urllib.parse.quote(projectId) + '/issues?' + urllib.parse.urlencode({'assigneeGroup': assigneeGroup})
-        if isinstance(url, str):
-            url = url.encode('utf-8')
+        items = self._importIssuesBisecting(url, numbered, bad_fields, report) if numbered else []
+        for item in items:
+            if item.getAttribute('imported').lower() == 'true':
+                print("Issue [ %s-%s ] imported successfully" % (projectId, item.getAttribute('id')))
+        if own_report and not report.ok:
+            sys.stderr.write(report.summary())
+        return ('<?xml version="1.0" ?><importResult>' +
+                ''.join(item.toxml() for item in items) + '</importResult>').encode('utf-8')
+
+    def _importIssuesBisecting(self, url, issues, bad_fields, report):
+        """ Imports issues in one request. If the response can't be parsed or lacks
+            results for some issues, the batch is split in halves until the issues the
+            server chokes on are isolated. An <error> response fails the whole batch.
+            Returns the <item> elements of the import results.
+        """
+        # ignore bad fields from getIssue()
+        xml, issue_records = xmlwriter.issues_document(issues, bad_fields)
+        report.add_request()
         result = self._reqXml('PUT', url, xml, 400)
-        if (result == "") and (len(issues) > 1):
-            for issue in issues:
-                self.importIssues(projectId, assigneeGroup, [issue])
-        response = ""
-        try:
-            response = result.toxml().encode('utf-8')
-        except:
-            sys.stderr.write("can't parse response")
-            sys.stderr.write("request was")
-            sys.stderr.write(xml)
-            return response
-        item_elements = minidom.parseString(response).getElementsByTagName("item")
-        if len(item_elements) != len(issues):
-            sys.stderr.write(response)
-        else:
-            for item in item_elements:
-                id = item.attributes["id"].value
-                imported = item.attributes["imported"].value.lower()
-                if imported == "true":
-                    print("Issue [ %s-%s ] imported successfully" % (projectId, id))
+        root = result.documentElement if hasattr(result, 'documentElement') else None
+        if root is not None and root.tagName == 'error':
+            # refused as a whole (unknown assignee group, no permission...), halves would fail alike
+            report.add_batch_failure([issue_id for issue_id, start, end in issue_records], root.toxml(),
+                                     xml.decode('utf-8'))
+            return []
+        items = root.getElementsByTagName('item') if root is not None and root.tagName == 'importResult' else None
+        if items is not None and len(items) == len(issues):
+            # items follow the order of the issues sent
+            for item, (issue_id, start, end) in zip(items, issue_records):
+                if item.getAttribute('imported').lower() == 'true':
+                    report.add_imported()
                 else:
-                    sys.stderr.write("")
-                    sys.stderr.write("Failed to import issue [ %s-%s ]." % (projectId, id))
-                    sys.stderr.write("Reason : ")
-                    sys.stderr.write(item.toxml())
-                    sys.stderr.write("Request was :")
-                    if isinstance(issue_records[id], str):
-                        sys.stderr.write(issue_records[id].encode('utf-8'))
-                    else:
-                        sys.stderr.write(issue_records[id])
-                print("")
-        return response
+                    report.add_failure(issue_id, item.toxml(), xml[start:end].decode('utf-8'))
+            return list(items)
+        if len(issues) == 1:
+            (issue_id, start, end), = issue_records
+            if hasattr(result, 'toxml'):
+                reason = result.documentElement.toxml()
+            elif isinstance(result, bytes):
+                reason = result.decode('utf-8', 'replace')
+            else:
+                reason = str(result) or "can't parse response"
+            report.add_failure(issue_id, reason, xml[start:end].decode('utf-8'))
+            return []
+        del xml, issue_records
+        middle = len(issues) // 2
+        return (self._importIssuesBisecting(url, issues[:middle], bad_fields, report) +
+                self._importIssuesBisecting(url, issues[middle:], bad_fields, report))
 
     def getProjects(self):
         projects = {}
@@ -680,22 +943,30 @@ class Connection(object):
         return self.createProjectDetailed(project.id, project.name, project.description, project.lead)
 
     def deleteProject(self, projectId):
-        return self._req('DELETE', "/admin/project/" + urllib.parse.quote(projectId))
+        try:
+            return self._req('DELETE', "/admin/project/" + urllib.parse.quote(projectId))
+        finally:
+            self._invalidate('projectCustomField', projectId)
+            self.capabilities.refresh(projectId)
 
     def createProjectDetailed(self, projectId, name, description, projectLeadLogin, startingNumber=1):
         _name = name
         _desc = description
-        if isinstance(_name, str):
-            _name = _name.encode('utf-8')
-        if isinstance(_desc, str):
-            _desc = _desc.encode('utf-8')
+        if isinstance(_name, bytes):
+            _name = _name.decode('utf-8')
+        if isinstance(_desc, bytes):
+            _desc = _desc.decode('utf-8')
         _name = _name.replace('/', ' ')
-        return self._put('/admin/project/' + projectId + '?' +
-                         urllib.parse.urlencode({'projectName': _name,
-                                           'description': _desc + ' ',
-                                           'projectLeadLogin': projectLeadLogin,
-                                           'lead': projectLeadLogin,
-                                           'startingNumber': str(startingNumber)}))
+        try:
+            return self._put('/admin/project/' + projectId + '?' +
+                             urllib.parse.urlencode({'projectName': _name,
+                                               'description': _desc + ' ',
+                                               'projectLeadLogin': projectLeadLogin,
+                                               'lead': projectLeadLogin,
+                                               'startingNumber': str(startingNumber)}))
+        finally:
+            # the server attaches the auto attached fields to the new project
+            self._invalidate('projectCustomField', projectId)
 
     # TODO this function is deprecated
     def createSubsystems(self, projectId, subsystems):
@@ -747,7 +1018,24 @@ class Connection(object):
             '/admin/project/' + urllib.parse.quote(projectId) + '/version/' + urllib.parse.quote(name.encode('utf-8')) + "?" +
             urllib.parse.urlencode(params))
 
-    def getIssues(self, projectId, filter, after, max):
+    def getIssues(self, projectId, filter, after, max, lazy=False):
+        """ With lazy, returns youtrack.LazyIssue objects, which decode fields on first access.
+        """
+        issue_class = youtrack.LazyIssue if lazy else decode_issue
+        return self._getIssues(projectId, filter, after, max, lambda e: issue_class(e, self))
+
+    def getCompactIssues(self, projectId, filter, after, max):
+        """ Same as getIssues, but returns youtrack.compact.CompactIssue records,
+            which take a fraction of the memory of Issue objects.
+        """
+        return self._getIssues(projectId, filter, after, max,
+                               lambda e: self._compactIssue(decode_issue(e, self), projectId))
+
+    def _compactIssue(self, issue, projectId=None):
+        project = getattr(issue, 'projectShortName', None) or projectId
+        return CompactIssue.from_object(issue, self.issue_schemas.get(project))
+
+    def _getIssues(self, projectId, filter, after, max, factory):
         #response, content = self._req('GET', '/project/issues/' + urllib.parse.quote(projectId) + "?" +
         path = '/issue'
         if projectId:
@@ -756,8 +1044,53 @@ class Connection(object):
                                              urllib.parse.urlencode({'after': str(after),
                                                                'max': str(max),
                                                                'filter': filter}))
-        xml = minidom.parseString(content)
-        return [youtrack.Issue(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self._iterElements(content, factory))
+
+    def getIssuesJson(self, projectId, filter, after, max, fields=None):
+        """ Same as getIssues, but reads the JSON /api/issues endpoint and transfers only
+            the given Issue attributes, e.g. fields=('id', 'updated', 'State', 'Assignee').
+            Names other than the standard issue attributes are custom fields.
+            fields=None requests the usual attributes and all custom fields.
+        """
+        projection, custom_fields = api.issue_projection(fields)
+        query = filter
+        if projectId:
+            query = ('project: {%s} %s' % (projectId, filter)).strip()
+        params = [('query', query), ('$skip', str(after)), ('$top', str(max)), ('fields', projection)]
+        params.extend(('customFields', name) for name in custom_fields or ())
+        response, content = self._req('GET', self.url + '/api/issues?' + urllib.parse.urlencode(params),
+                                      content_type='application/json')
+        return [api.issue_from_json(data, self, fields) for data in json.loads(content)]
+
+    def iterIssues(self, projectId, filter='', page_size=100, after=0, fields=None, compact=False, lazy=False):
+        """ Yields issues matching filter page by page until an empty page is returned.
+            Page N+1 is requested in the background while the caller processes page N.
+            With fields, issues are read through getIssuesJson with that projection.
+            With compact, CompactIssue records are yielded instead of Issue objects,
+            with lazy, LazyIssue objects.
+        """
+        if fields is not None:
+            get_page = functools.partial(self.getIssuesJson, fields=fields)
+            if compact:
+                get_json_page = get_page
+                get_page = lambda *args: [self._compactIssue(issue, projectId) for issue in get_json_page(*args)]
+        elif compact:
+            get_page = self.getCompactIssues
+        else:
+            get_page = functools.partial(self.getIssues, lazy=lazy)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            next_page = executor.submit(get_page, projectId, filter, after, page_size)
+            while True:
+                issues = next_page.result()
+                if not len(issues):
+                    return
+                after += page_size
+                next_page = executor.submit(get_page, projectId, filter, after, page_size)
+                for issue in issues:
+                    yield issue
+        finally:
+            executor.shutdown(wait=False)
 
     def getNumberOfIssues(self, filter = '', waitForServer=True):
         while True:
@@ -780,20 +1113,29 @@ class Connection(object):
         xml = minidom.parseString(content)
         return [(e.getAttribute('name'),e.getAttribute('start'),e.getAttribute('finish')) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
 
-    def getAllIssues(self, filter = '', after = 0, max = 999999, withFields = ()):
+    def iterAllIssues(self, filter = '', after = 0, max = 999999, withFields = ()):
+        """ Same as getAllIssues, but yields Issue objects one by one while decoding the response.
+            The request is sent immediately; decoding happens as the result is consumed.
+        """
         urlJobby = [('with',field) for field in withFields] + \
                     [('after',str(after)),
                     ('max',str(max)),
                     ('filter',filter)]
         response, content = self._req('GET', '/issue' + "?" +
                                              urllib.parse.urlencode(urlJobby))
-        xml = minidom.parseString(content)
-        return [youtrack.Issue(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return self._iterElements(content, lambda e: decode_issue(e, self))
 
-    def exportIssueLinks(self):
+    def getAllIssues(self, filter = '', after = 0, max = 999999, withFields = ()):
+        return list(self.iterAllIssues(filter, after, max, withFields))
+
+    def iterIssueLinks(self):
+        """ Same as exportIssueLinks, but yields Link objects one by one while decoding the response.
+        """
         response, content = self._req('GET', '/export/links')
-        xml = minidom.parseString(content)
-        return [youtrack.Link(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return self._iterElements(content, lambda e: youtrack.Link(e, self))
+
+    def exportIssueLinks(self):
+        return list(self.iterIssueLinks())
 
     def executeCommand(self, issueId, command, comment=None, group=None, run_as=None, disable_notifications=False):
         if isinstance(command, str):
@@ -824,13 +1166,15 @@ class Connection(object):
         return "Command executed"
 
     def getCustomField(self, name):
-        return youtrack.CustomField(self._get("/admin/customfield/field/" + urllib.parse.quote(name.encode('utf-8'))), self)
+        return self._cached(self._metadata_key('customField', name), lambda: youtrack.CustomField(
+            self._get("/admin/customfield/field/" + urllib.parse.quote(name.encode('utf-8'))), self))
 
     def getCustomFields(self):
         response, content = self._req('GET', '/admin/customfield/field')
         xml = minidom.parseString(content)
-        return [self.getCustomField(e.getAttribute('name')) for e in xml.documentElement.childNodes if
-                e.nodeType == Node.ELEMENT_NODE]
+        return self._mapConcurrently(self.getCustomField, [e.getAttribute('name') for e in
+                                                           xml.documentElement.childNodes if
+                                                           e.nodeType == Node.ELEMENT_NODE])
 
     def createCustomField(self, cf):
         params = dict([])
@@ -853,8 +1197,13 @@ class Connection(object):
             if isinstance(params[key], str):
                 params[key] = params[key].encode('utf-8')
 
-        self._put('/admin/customfield/field/' + urllib.parse.quote(customFieldName.encode('utf-8')) + '?' +
-                  urllib.parse.urlencode(params), )
+        try:
+            self._put('/admin/customfield/field/' + urllib.parse.quote(customFieldName.encode('utf-8')) + '?' +
+                      urllib.parse.urlencode(params), )
+        finally:
+            self._invalidate('customField', customFieldName)
+            # an auto attached field shows up in projects without createProjectCustomField
+            self._invalidate('projectCustomField')
 
         return "Created"
 
@@ -863,17 +1212,18 @@ class Connection(object):
             self.createCustomField(cf)
 
     def getProjectCustomField(self, projectId, name):
+        key = self._metadata_key('projectCustomField', projectId, name)
         if isinstance(name, str):
             name = name.encode('utf8')
-        return youtrack.ProjectCustomField(
+        return self._cached(key, lambda: youtrack.ProjectCustomField(
             self._get("/admin/project/" + urllib.parse.quote(projectId) + "/customfield/" + urllib.parse.quote(name))
-            , self)
+            , self))
 
     def getProjectCustomFields(self, projectId):
         response, content = self._req('GET', '/admin/project/' + urllib.parse.quote(projectId) + '/customfield')
         xml = minidom.parseString(content)
-        return [self.getProjectCustomField(projectId, e.getAttribute('name')) for e in
-                xml.getElementsByTagName('projectCustomField')]
+        return self._mapConcurrently(lambda name: self.getProjectCustomField(projectId, name),
+                                     [e.getAttribute('name') for e in xml.getElementsByTagName('projectCustomField')])
 
     def createProjectCustomField(self, projectId, pcf):
         return self.createProjectCustomFieldDetailed(projectId, pcf.name, pcf.emptyText, pcf.params)
@@ -889,12 +1239,18 @@ class Connection(object):
         for key in _params:
             if isinstance(_params[key], str):
                 _params[key] = _params[key].encode('utf-8')
-        return self._put(
-            '/admin/project/' + projectId + '/customfield/' + urllib.parse.quote(customFieldName) + '?' +
-            urllib.parse.urlencode(_params))
+        try:
+            return self._put(
+                '/admin/project/' + projectId + '/customfield/' + urllib.parse.quote(customFieldName) + '?' +
+                urllib.parse.urlencode(_params))
+        finally:
+            self._invalidate('projectCustomField', projectId, customFieldName)
 
     def deleteProjectCustomField(self, project_id, pcf_name):
-        self._req('DELETE', '/admin/project/' + urllib.parse.quote(project_id) + "/customfield/" + urllib.parse.quote(pcf_name))
+        try:
+            self._req('DELETE', '/admin/project/' + urllib.parse.quote(project_id) + "/customfield/" + urllib.parse.quote(pcf_name))
+        finally:
+            self._invalidate('projectCustomField', project_id, pcf_name)
 
     def getIssueLinkTypes(self):
         response, content = self._req('GET', '/admin/issueLinkType')
@@ -950,28 +1306,12 @@ class Connection(object):
             '/issue/%s/timetracking/workitem' % urllib.parse.quote(issue_id), xml)
 
     def importWorkItems(self, issue_id, work_items):
-        xml = ''
-        for work_item in work_items:
-            xml +=  '<workItem>'
-            xml += '<date>%s</date>' % work_item.date
-            xml += '<duration>%s</duration>' % work_item.duration
-            if hasattr(work_item, 'description') and work_item.description is not None:
-                xml += '<description>%s</description>' % escape(work_item.description)
-            if hasattr(work_item, 'worktype') and work_item.worktype is not None:
-                xml += '<worktype><name>%s</name></worktype>' % work_item.worktype
-            xml += '<author login=%s></author>' % quoteattr(work_item.authorLogin)
-            xml += '</workItem>'
-        if isinstance(xml, str):
-            xml = xml.encode('utf-8')
-        if xml:
-            xml = '<workItems>' + xml + '</workItems>'
-            try:
-                self.headers['Accept'] = 'application/xml'
-                self._reqXml(
-                    'PUT',
-                    '/import/issue/%s/workitems' % urllib.parse.quote(issue_id), xml)
-            finally:
-                del self.headers['Accept']
+        if work_items:
+            xml = xmlwriter.work_items_document(work_items)
+            self._reqXml(
+                'PUT',
+                '/import/issue/%s/workitems' % urllib.parse.quote(issue_id), xml,
+                accept='application/xml')
 
     def getSearchIntelliSense(self, query,
                               context=None, caret=None, options_limit=None):
@@ -1030,16 +1370,15 @@ class Connection(object):
         else:
             xml = '<settings>'
         if estimateField is not None and estimateField != '':
-            if isinstance(estimateField, str):
-                estimateField = estimateField.encode('utf-8')
-            xml += '<estimation name="%s"/>' % estimateField
+            xml += '<estimation name=%s/>' % quoteattr(estimateField)
         if timeSpentField is not None and timeSpentField != '':
-            if isinstance(timeSpentField, str):
-                timeSpentField = timeSpentField.encode('utf-8')
-            xml += '<spentTime name="%s"/>' % timeSpentField
+            xml += '<spentTime name=%s/>' % quoteattr(timeSpentField)
         xml += '</settings>'
-        return self._reqXml(
-            'PUT', '/admin/project/' + projectId + '/timetracking', xml)
+        try:
+            return self._reqXml(
+                'PUT', '/admin/project/' + projectId + '/timetracking', xml)
+        finally:
+            self.capabilities.refresh(projectId)
 
     def get_work_types(self, project_id=None):
         if project_id:
@@ -1107,7 +1446,7 @@ class Connection(object):
         names = [e.getAttribute("name") for e in self._get('/admin/customfield/' +
                                                            self.bundle_paths[field_type]).getElementsByTagName(
             tag_name)]
-        return [self.getBundle(field_type, name) for name in names]
+        return self._mapConcurrently(lambda name: self.getBundle(field_type, name), names)
 
 
     def get_field_type(self, field_type):
@@ -1117,25 +1456,41 @@ class Connection(object):
 
     def getBundle(self, field_type, name):
         field_type = self.get_field_type(field_type)
-        response = self._get('/admin/customfield/%s/%s' % (self.bundle_paths[field_type],
-                                                           urllib.parse.quote(name.encode('utf-8'))))
-        return self.bundle_types[field_type](response, self)
+        return self._cached(self._metadata_key('bundle', field_type, name), lambda: self.bundle_types[field_type](
+            self._get('/admin/customfield/%s/%s' % (self.bundle_paths[field_type],
+                                                    urllib.parse.quote(name.encode('utf-8')))), self))
 
     def renameBundle(self, bundle, new_name):
-        response, content = self._req("POST", "/admin/customfield/%s/%s?newName=%s" % (
-            self.bundle_paths[bundle.get_field_type()], bundle.name, new_name), "", ignoreStatus=301)
+        try:
+            response, content = self._req("POST", "/admin/customfield/%s/%s?newName=%s" % (
+                self.bundle_paths[bundle.get_field_type()], bundle.name, new_name), "", ignoreStatus=301)
+        finally:
+            self._invalidate('bundle', bundle.get_field_type(), bundle.name)
+            self._invalidate('bundle', bundle.get_field_type(), new_name)
         return response
 
     def createBundle(self, bundle):
-        return self._reqXml('PUT', '/admin/customfield/' + self.bundle_paths[bundle.get_field_type()],
-            body=bundle.toXml(), ignoreStatus=400)
+        try:
+            return self._reqXml('PUT', '/admin/customfield/' + self.bundle_paths[bundle.get_field_type()],
+                body=bundle.toXml(), ignoreStatus=400)
+        finally:
+            self._invalidate('bundle', bundle.get_field_type(), bundle.name)
 
     def deleteBundle(self, bundle):
-        response, content = self._req("DELETE", "/admin/customfield/%s/%s" % (
-            self.bundle_paths[bundle.get_field_type()], bundle.name), "")
+        try:
+            response, content = self._req("DELETE", "/admin/customfield/%s/%s" % (
+                self.bundle_paths[bundle.get_field_type()], bundle.name), "")
+        finally:
+            self._invalidate('bundle', bundle.get_field_type(), bundle.name)
         return response
 
     def addValueToBundle(self, bundle, value):
+        result = self._addValueToBundle(bundle, value)
+        # a failed PUT (the value is there already, most often) leaves the bundle as cached
+        self._invalidate('bundle', bundle.get_field_type(), bundle.name)
+        return result
+
+    def _addValueToBundle(self, bundle, value):
         request = ""
         if bundle.get_field_type() != "user":
             request = "/admin/customfield/%s/%s/" % (
@@ -1174,7 +1529,10 @@ class Connection(object):
             request += "individual/" + urllib.parse.quote(value.login)
         else:
             request += "group/" + value.name
-        response, content = self._req("DELETE", request, "", ignoreStatus=204)
+        try:
+            response, content = self._req("DELETE", request, "", ignoreStatus=204)
+        finally:
+            self._invalidate('bundle', field_type, bundle.name)
         return response
 
 
@@ -1213,7 +1571,7 @@ class Connection(object):
             return 0
 
     def isMarkdownSupported(self):
-        return self.getYouTrackBuildNumber() > 39406
+        return self.capabilities.markdown
 
     bundle_paths = {
         "enum": "bundle",
@@ -0,0 +1,147 @@
+"""
+Single-pass decoder for <issue> elements.
+
+decode_issue visits every node of the issue subtree once and returns the same
+youtrack.Issue that Issue(element, connection) builds with its separate
+getElementsByTagName scans for field values, links, tags and attachments.
+"""
+
+from xml.dom import Node
+from xml.dom.minidom import Document
+
+import youtrack
+
+ELEMENT_NODE = Node.ELEMENT_NODE
+TEXT_NODE = Node.TEXT_NODE
+
+
+def _text(element):
+    return "".join([e.data for e in element.childNodes if e.nodeType == TEXT_NODE])
+
+
+def _multiple(value):
+    # the comma separated form of fixedVersion / affectsVersion, see Issue._normilizeMultiple
+    if isinstance(value, list):
+        return value
+    if not len(value):
+        return _ABSENT
+    return [v.strip() for v in value.split(',')]
+
+
+def _fixed_in_build(value):
+    return None if value == 'Next build' else value
+
+
+def _overwritten(value):
+    # links, tags and attachments fields are replaced once the whole issue has been read
+    return None
+
+
+_ABSENT = object()
+
+# field name -> post-processing of the decoded value
+FIELD_DECODERS = {
+    'fixedVersion': _multiple,
+    'affectsVersion': _multiple,
+    'fixedInBuild': _fixed_in_build,
+    'links': _overwritten,
+    'tags': _overwritten,
+    'attachments': _overwritten,
+}
+
+# elements collected anywhere in the issue for links, tags and attachments
+COLLECTED_TAGS = frozenset(['links', 'issueLink', 'tag', 'attachments', 'fileUrl'])
+
+
+class _Collected(object):
+    __slots__ = ('links', 'issue_links', 'tags', 'attachments', 'file_urls')
+
+    def __init__(self):
+        self.links = False
+        self.issue_links = []
+        self.tags = []
+        self.attachments = False
+        self.file_urls = []
+
+    def add(self, element):
+        tag = element.tagName
+        if tag == 'issueLink':
+            self.issue_links.append(element)
+        elif tag == 'tag':
+            self.tags.append(element)
+        elif tag == 'fileUrl':
+            self.file_urls.append(element)
+        elif tag == 'links':
+            self.links = True
+        else:
+            self.attachments = True
+
+
+def _walk(element, values, collected):
+    """ Collects <value> descendants of element in document order, and the
+        link/tag/attachment elements, visiting each node once.
+    """
+    for child in element.childNodes:
+        if child.nodeType != ELEMENT_NODE:
+            continue
+        tag = child.tagName
+        if tag == 'value':
+            values.append(child)
+        elif tag in COLLECTED_TAGS:
+            collected.add(child)
+        if child.firstChild is not None:
+            _walk(child, values, collected)
+
+
+def _set(attrs, name, value):
+    decoder = FIELD_DECODERS.get(name)
+    if decoder is not None:
+        value = decoder(value)
+        if value is _ABSENT:
+            attrs.pop(name, None)
+            return
+    attrs[name] = value
+
+
+def decode_issue(element, connection=None):
+    """ Returns youtrack.Issue for an <issue> element (or a document with one).
+    """
+    if isinstance(element, Document):
+        element = element.documentElement
+    issue = youtrack.Issue.__new__(youtrack.Issue)
+    attrs = issue.__dict__
+    attrs['youtrack'] = connection
+    attribute_types = attrs['_attribute_types'] = dict()
+
+    if element.attributes is not None:
+        for i in range(element.attributes.length):
+            a = element.attributes.item(i)
+            _set(attrs, a.name, a.value)
+
+    collected = _Collected()
+    for child in element.childNodes:
+        if child.nodeType != ELEMENT_NODE:
+            continue
+        if child.tagName in COLLECTED_TAGS:
+            collected.add(child)
+        values = []
+        if child.firstChild is not None:
+            _walk(child, values, collected)
+        name = child.getAttribute('name')
+        if not len(name):
+            continue
+        if values:
+            value = _text(values[0]) if len(values) == 1 else [_text(v) for v in values]
+        elif child.hasAttribute('value'):
+            value = child.getAttribute('value')
+        else:
+            continue
+        if child.hasAttribute('xsi:type'):
+            attribute_types[name] = child.getAttribute('xsi:type')
+        _set(attrs, name, value)
+
+    attrs['links'] = [youtrack.Link(e, connection) for e in collected.issue_links] if collected.links else None
+    attrs['tags'] = [_text(e) for e in collected.tags] if collected.tags else None
+    attrs['attachments'] = [youtrack.Attachment(e, connection) for e in collected.file_urls] \
+        if collected.attachments else None
+    return issue
@@ -0,0 +1,80 @@
+import threading
+
+
+class ImportFailure(object):
+    """ An issue the server refused to import: its id (numberInProject), the reason
+        returned by the server and the <issue> record that was sent.
+        A batch refused as a whole is a single failure with issue_id None, the ids
+        of all its issues in issue_ids and the whole <issues> document as record.
+        Issues without numberInProject are refused before sending, with issue_id None.
+    """
+    def __init__(self, issue_id, reason, record, issue_ids=None):
+        self.issue_id = issue_id
+        self.reason = reason
+        self.record = record
+        self.issue_ids = [issue_id] if issue_ids is None else issue_ids
+
+    @property
+    def label(self):
+        if self.issue_id is not None:
+            return self.issue_id
+        if self.issue_ids == [None]:
+            return 'issue without numberInProject'
+        shown = ', '.join(self.issue_ids[:5]) + (', ...' if len(self.issue_ids) > 5 else '')
+        return 'batch of %d issues (%s)' % (len(self.issue_ids), shown)
+
+    def to_dict(self):
+        return {'issue_id': self.issue_id, 'issue_ids': self.issue_ids, 'reason': self.reason,
+                'record': self.record}
+
+    def __repr__(self):
+        return 'ImportFailure(%r, %r)' % (self.label, self.reason)
+
+
+class ImportReport(object):
+    """ Outcome of one or more Connection.importIssues calls.
+        `requests` counts the PUTs made, including the ones spent on bisecting
+        batches the server could not process as a whole.
+    """
+    def __init__(self):
+        self.imported = 0
+        self.requests = 0
+        self.failures = []
+        self._lock = threading.Lock()
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_imported(self, count=1):
+        with self._lock:
+            self.imported += count
+
+    def add_failure(self, issue_id, reason, record):
+        with self._lock:
+            self.failures.append(ImportFailure(issue_id, reason, record))
+
+    def add_batch_failure(self, issue_ids, reason, record):
+        with self._lock:
+            self.failures.append(ImportFailure(None, reason, record, list(issue_ids)))
+
+    def failed_ids(self):
+        with self._lock:
+            return [issue_id for failure in self.failures for issue_id in failure.issue_ids]
+
+    def to_dict(self):
+        with self._lock:
+            return {'imported': self.imported,
+                    'requests': self.requests,
+                    'failures': [failure.to_dict() for failure in self.failures]}
+
+    def summary(self):
+        with self._lock:
+            failed = sum(len(failure.issue_ids) for failure in self.failures)
+            lines = ['%d imported, %d failed, %d requests' % (self.imported, failed, self.requests)]
+            lines.extend('  %s: %s' % (failure.label, failure.reason) for failure in self.failures)
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,186 @@
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Path segments of the REST API that are never ids or names
+STATIC_SEGMENTS = frozenset([
+    'admin', 'agile', 'all', 'api', 'assignee', 'attachment', 'build', 'buildBundle', 'bundle', 'byproject',
+    'changes', 'comment', 'config', 'count', 'customfield', 'event', 'execute', 'export', 'field', 'group',
+    'import', 'individual', 'intellisense', 'issue', 'issueEvents', 'issueLinkType', 'issues', 'link', 'links',
+    'login', 'ownedFieldBundle', 'permission', 'project', 'rest', 'role', 'sprints', 'stateBundle', 'subsystem',
+    'timetracking', 'user', 'userBundle', 'users', 'version', 'versionBundle', 'workitem', 'workitems',
+    'worktype',
+])
+
+PLACEHOLDERS = {
+    'agile': '{id}',
+    'attachment': '{id}',
+    'import': '{project}',
+    'individual': '{login}',
+    'issue': '{id}',
+    'issueEvents': '{id}',
+    'project': '{id}',
+    'user': '{login}',
+    'worktype': '{id}',
+}
+
+
+def url_template(path):
+    """ Replaces ids and names in a REST path with placeholders:
+        /issue/ABC-12/comment -> /issue/{id}/comment
+        /admin/project/ABC/customfield/Priority -> /admin/project/{id}/customfield/{name}
+    """
+    if path.startswith('/rest/'):
+        path = path[len('/rest'):]
+    segments = path.split('/')
+    previous = None
+    for i, segment in enumerate(segments):
+        if not segment:
+            continue
+        if segment in STATIC_SEGMENTS:
+            previous = segment
+        else:
+            segments[i] = PLACEHOLDERS.get(previous, '{name}')
+            previous = None
+    return '/'.join(segments)
+
+
+class EndpointStats(object):
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def to_dict(self):
+        return {'count': self.count,
+                'errors': self.errors,
+                'request_bytes': self.request_bytes,
+                'response_bytes': self.response_bytes,
+                'latency_sum': self.latency_sum,
+                'latency_buckets': dict(zip(LATENCY_BUCKETS + (float('inf'),), self._cumulative()))}
+
+    def _cumulative(self):
+        total = 0
+        result = []
+        for value in self.buckets:
+            total += value
+            result.append(total)
+        return result
+
+
+def _size(data):
+    if data is None:
+        return 0
+    try:
+        return len(data)
+    except TypeError:
+        return 0
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry(object):
+    """ Request statistics per HTTP method and URL template, filled in by Connection._req.
+    """
+    def __init__(self, prefix='youtrack'):
+        self.prefix = prefix
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, path, status, elapsed, body=None, content=None):
+        key = (method, url_template(path))
+        bucket = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                bucket = i
+                break
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats()
+            stats.count += 1
+            if status is None or status >= 400:
+                stats.errors += 1
+            stats.request_bytes += _size(body)
+            stats.response_bytes += _size(content)
+            stats.latency_sum += elapsed
+            stats.buckets[bucket] += 1
+
+    def snapshot(self):
+        """ Returns {(method, url_template): stats dict}.
+        """
+        with self._lock:
+            return dict((key, stats.to_dict()) for key, stats in self._endpoints.items())
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def to_prometheus(self):
+        """ Returns the statistics in Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        name = self.prefix
+        lines = []
+        counters = (('requests_total', 'count', 'Number of HTTP requests'),
+                    ('request_errors_total', 'errors', 'Number of failed HTTP requests'),
+                    ('request_bytes_total', 'request_bytes', 'Bytes sent in request bodies'),
+                    ('response_bytes_total', 'response_bytes', 'Bytes received in response bodies'))
+        for metric, field, help_text in counters:
+            lines.append('# HELP %s_%s %s' % (name, metric, help_text))
+            lines.append('# TYPE %s_%s counter' % (name, metric))
+            for (method, endpoint), stats in sorted(snapshot.items()):
+                lines.append('%s_%s{method="%s",endpoint="%s"} %d' %
+                             (name, metric, _label(method), _label(endpoint), stats[field]))
+        metric = '%s_request_duration_seconds' % name
+        lines.append('# HELP %s HTTP request latency' % metric)
+        lines.append('# TYPE %s histogram' % metric)
+        for (method, endpoint), stats in sorted(snapshot.items()):
+            labels = 'method="%s",endpoint="%s"' % (_label(method), _label(endpoint))
+            for bound, value in sorted(stats['latency_buckets'].items()):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('%s_bucket{%s,le="%s"} %d' % (metric, labels, le, value))
+            lines.append('%s_sum{%s} %r' % (metric, labels, stats['latency_sum']))
+            lines.append('%s_count{%s} %d' % (metric, labels, stats['count']))
+        return '\n'.join(lines) + '\n'
+
+
+class CompressionStats(object):
+    """ Counters for compressed transfers made by a Connection.
+        Only request bodies are compressed here, so bytes_saved covers requests.
+        httplib2 decodes gzip/deflate responses before they reach the connection
+        and doesn't report their size on the wire; they are only counted.
+    """
+    def __init__(self):
+        self.compressed_requests = 0
+        self.request_bytes_raw = 0
+        self.request_bytes_sent = 0
+        self.encoded_responses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def bytes_saved(self):
+        return self.request_bytes_raw - self.request_bytes_sent
+
+    def record_request(self, raw_size, sent_size):
+        with self._lock:
+            self.compressed_requests += 1
+            self.request_bytes_raw += raw_size
+            self.request_bytes_sent += sent_size
+
+    def record_encoded_response(self):
+        with self._lock:
+            self.encoded_responses += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'compressed_requests': self.compressed_requests,
+                    'request_bytes_raw': self.request_bytes_raw,
+                    'request_bytes_sent': self.request_bytes_sent,
+                    'bytes_saved': self.bytes_saved,
+                    'encoded_responses': self.encoded_responses}
@@ -0,0 +1,256 @@
+"""
+Local SQLite copy of the issues of one or more projects.
+
+IssueMirror.refresh pulls only the issues updated since the previous refresh
+(an `updated:` range query, like youtrack.sync.youtracks.get_advanced_query
+builds) and upserts them together with their comments, links and custom field
+values. Reads then never go to the server.
+"""
+
+import concurrent.futures
+import datetime
+import json
+import sqlite3
+import time
+
+from youtrack import serialization
+
+# get_advanced_query's format has no year, which breaks ranges that span a new year
+QUERY_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# the server reads query dates in its user's timezone; without one, ranges are widened
+# by the largest UTC offset on either side (-12:00 .. +14:00)
+UNKNOWN_TIMEZONE_MARGIN = 14 * 3600
+
+# issue fields stored in their own columns, everything else goes to custom_fields too
+ISSUE_COLUMNS = ('id', 'projectShortName', 'numberInProject', 'summary', 'description',
+                 'reporterName', 'updaterName', 'created', 'updated', 'resolved')
+NOT_CUSTOM_FIELDS = frozenset(ISSUE_COLUMNS + ('entityId', 'commentsCount', 'votes', 'links', 'tags',
+                                               'attachments', 'comments', 'youtrack', '_attribute_types',
+                                               'updaterFullName', 'reporterFullName'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS issues (
+    id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    number INTEGER,
+    summary TEXT,
+    description TEXT,
+    reporter TEXT,
+    updater TEXT,
+    created INTEGER,
+    updated INTEGER,
+    resolved INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS issues_project_updated ON issues (project, updated);
+CREATE TABLE IF NOT EXISTS custom_fields (
+    issue_id TEXT NOT NULL REFERENCES issues (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT,
+    PRIMARY KEY (issue_id, name, position)
+);
+CREATE INDEX IF NOT EXISTS custom_fields_name_value ON custom_fields (name, value);
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    issue_id TEXT NOT NULL REFERENCES issues (id) ON DELETE CASCADE,
+    author TEXT,
+    created INTEGER,
+    updated INTEGER,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS comments_issue ON comments (issue_id);
+CREATE TABLE IF NOT EXISTS links (
+    issue_id TEXT NOT NULL REFERENCES issues (id) ON DELETE CASCADE,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    type_name TEXT NOT NULL,
+    PRIMARY KEY (issue_id, source, target, type_name)
+);
+CREATE TABLE IF NOT EXISTS refresh_state (
+    project TEXT PRIMARY KEY,
+    last_updated INTEGER,
+    refreshed_at INTEGER
+);
+'''
+
+
+def _millis(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def updated_query(query, start, end):
+    """ Appends an updated: range to query, start and end being datetimes.
+    """
+    return (query + ' updated: ' + start.strftime(QUERY_TIME_FORMAT) + ' .. ' +
+            end.strftime(QUERY_TIME_FORMAT)).strip()
+
+
+class IssueMirror(object):
+    """ Issues, comments, links and custom field values of the mirrored projects in
+        a SQLite file. `overlap` seconds are subtracted from the start of every
+        refresh range to cover clock differences; issues pulled twice are just
+        written again.
+        `timezone` (a datetime.tzinfo) is the timezone of the connection's user, in
+        which the server reads the `updated:` range. When it is not given the range
+        is written in UTC and widened by UNKNOWN_TIMEZONE_MARGIN on both sides.
+    """
+    def __init__(self, connection, path, overlap=300, workers=None, timezone=None):
+        self.connection = connection
+        self.path = path
+        self.overlap = overlap
+        self.timezone = timezone
+        self.workers = workers or getattr(getattr(connection, 'http', None), 'size', 1)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def last_updated(self, project_id):
+        row = self.db.execute('SELECT last_updated FROM refresh_state WHERE project = ?', (project_id,)).fetchone()
+        return row[0] if row else None
+
+    def refresh(self, project_id, query='', page_size=100, comments=True, links=True):
+        """ Pulls the issues of project_id (matching query) updated since the last refresh,
+            all of them the first time. Returns the number of issues written.
+        """
+        last_updated = self.last_updated(project_id)
+        if last_updated is not None:
+            query = updated_query(query, *self._range(last_updated))
+        count = 0
+        newest = last_updated
+        page = []
+        for issue in self.connection.iterIssues(project_id, query, page_size):
+            page.append(issue)
+            if len(page) >= page_size:
+                newest = self._store_page(project_id, page, comments, links, newest)
+                count += len(page)
+                page = []
+        if page:
+            newest = self._store_page(project_id, page, comments, links, newest)
+            count += len(page)
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO refresh_state (project, last_updated, refreshed_at) '
+                            'VALUES (?, ?, ?)', (project_id, newest, int(time.time() * 1000)))
+        return count
+
+    def _range(self, last_updated):
+        """ Returns the (start, end) datetimes of the refresh range, as the server's user sees them.
+        """
+        margin = self.overlap
+        timezone = self.timezone
+        if timezone is None:
+            timezone = datetime.timezone.utc
+            margin += UNKNOWN_TIMEZONE_MARGIN
+        margin = datetime.timedelta(seconds=margin)
+        start = datetime.datetime.fromtimestamp(last_updated / 1000.0, timezone) - margin
+        end = datetime.datetime.now(timezone) + margin
+        return start, end
+
+    def _related(self, issues, comments, links):
+        # None stands for not fetched: the stored rows of that kind are left as they are
+        def fetch(issue):
+            issue_comments = None
+            if comments:
+                issue_comments = []
+                if getattr(issue, 'commentsCount', '1') != '0':
+                    issue_comments = self.connection.getComments(issue.id)
+            issue_links = self.connection.getLinks(issue.id) if links else None
+            return issue_comments, issue_links
+        if self.workers <= 1 or len(issues) <= 1:
+            return [fetch(issue) for issue in issues]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(issues))) as executor:
+            return list(executor.map(fetch, issues))
+
+    def _store_page(self, project_id, issues, comments, links, newest):
+        related = self._related(issues, comments, links) if comments or links else [(None, None)] * len(issues)
+        with self.db:
+            for issue, (issue_comments, issue_links) in zip(issues, related):
+                self._store(project_id, issue, issue_comments, issue_links)
+                updated = _millis(getattr(issue, 'updated', None))
+                if updated is not None and (newest is None or updated > newest):
+                    newest = updated
+        return newest
+
+    def _store(self, project_id, issue, issue_comments, issue_links):
+        issue_id = issue.id
+        get = lambda name: getattr(issue, name, None)
+        # an upsert, not INSERT OR REPLACE: replacing deletes the row and cascades to comments and links
+        self.db.execute('INSERT INTO issues (id, project, number, summary, description, reporter, '
+                        'updater, created, updated, resolved, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (id) DO UPDATE SET project = excluded.project, number = excluded.number, '
+                        'summary = excluded.summary, description = excluded.description, '
+                        'reporter = excluded.reporter, updater = excluded.updater, created = excluded.created, '
+                        'updated = excluded.updated, resolved = excluded.resolved, data = excluded.data',
+                        (issue_id, get('projectShortName') or project_id, _millis(get('numberInProject')),
+                         get('summary'), get('description'), get('reporterName'), get('updaterName'),
+                         _millis(get('created')), _millis(get('updated')), _millis(get('resolved')),
+                         json.dumps(serialization.to_data(issue), ensure_ascii=False)))
+        self.db.execute('DELETE FROM custom_fields WHERE issue_id = ?', (issue_id,))
+        rows = []
+        for name in issue:
+            if name in NOT_CUSTOM_FIELDS:
+                continue
+            value = issue[name]
+            values = value if isinstance(value, list) else [value]
+            rows.extend((issue_id, name, position, v) for position, v in enumerate(values) if isinstance(v, str))
+        self.db.executemany('INSERT INTO custom_fields (issue_id, name, position, value) VALUES (?, ?, ?, ?)', rows)
+        if issue_comments is not None:
+            self.db.execute('DELETE FROM comments WHERE issue_id = ?', (issue_id,))
+            self.db.executemany('INSERT OR REPLACE INTO comments (id, issue_id, author, created, updated, text) '
+                                'VALUES (?, ?, ?, ?, ?, ?)',
+                                [(c.id, issue_id, getattr(c, 'author', None), _millis(getattr(c, 'created', None)),
+                                  _millis(getattr(c, 'updated', None)), getattr(c, 'text', None))
+                                 for c in issue_comments])
+        if issue_links is not None:
+            self.db.execute('DELETE FROM links WHERE issue_id = ?', (issue_id,))
+            self.db.executemany('INSERT OR IGNORE INTO links (issue_id, source, target, type_name) VALUES (?, ?, ?, ?)',
+                                [(issue_id, l.source, l.target, l.typeName) for l in issue_links])
+
+    def prune(self, project_id):
+        """ Deletes issues that no longer exist on the server. Only issue ids are
+            transferred, through the JSON /api endpoint. Returns the number removed.
+        """
+        existing = set(issue.id for issue in self.connection.iterIssues(project_id, '', 500, fields=('id',)))
+        local = [row[0] for row in self.db.execute('SELECT id FROM issues WHERE project = ?', (project_id,))]
+        removed = [(issue_id,) for issue_id in local if issue_id not in existing]
+        with self.db:
+            self.db.executemany('DELETE FROM issues WHERE id = ?', removed)
+        return len(removed)
+
+    def get(self, issue_id):
+        """ Returns the mirrored youtrack.Issue, None if it isn't in the mirror.
+        """
+        row = self.db.execute('SELECT data FROM issues WHERE id = ?', (issue_id,)).fetchone()
+        if row is None:
+            return None
+        return serialization.from_data(json.loads(row[0]), self.connection)
+
+    def issues(self, where='1', params=()):
+        """ Yields mirrored issues matching an SQL condition on the issues table,
+            e.g. issues('project = ? AND resolved IS NULL', ('JT',)).
+        """
+        classes = serialization.model_classes()
+        for row in self.db.execute('SELECT data FROM issues WHERE ' + where + ' ORDER BY project, number', params):
+            yield serialization.from_data(json.loads(row[0]), self.connection, classes)
+
+    def comments(self, issue_id):
+        return self.db.execute('SELECT id, author, created, updated, text FROM comments WHERE issue_id = ? '
+                               'ORDER BY created', (issue_id,)).fetchall()
+
+    def links(self, issue_id):
+        return self.db.execute('SELECT source, target, type_name FROM links WHERE issue_id = ?', (issue_id,)).fetchall()
+
+    def query(self, sql, params=()):
+        return self.db.execute(sql, params).fetchall()
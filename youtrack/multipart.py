@@ -0,0 +1,56 @@
+import io
+import uuid
+
+CHUNK_SIZE = 64 * 1024
+
+
+def stream_length(stream):
+    """ Returns the number of bytes left in a seekable stream, None if it can't be told.
+    """
+    try:
+        if not stream.seekable():
+            return None
+        position = stream.tell()
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(position)
+        return end - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class MultipartEncoder(object):
+    """ multipart/form-data body with a single file part, read from `stream`
+        chunk by chunk while it is being sent.
+        `length` is the full body size when the file size is known, None otherwise
+        (the body has to go out with chunked transfer encoding then).
+    """
+    def __init__(self, field_name, file_name, stream, content_type=None, content_length=None,
+                 chunk_size=CHUNK_SIZE):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=' + self.boundary
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._head = ('--%s\r\n'
+                      'Content-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                      'Content-Type: %s\r\n\r\n' % (self.boundary, self._quote(field_name),
+                                                    self._quote(file_name),
+                                                    content_type or 'application/octet-stream')).encode('utf-8')
+        self._tail = ('\r\n--%s--\r\n' % self.boundary).encode('utf-8')
+        if content_length is None:
+            content_length = stream_length(stream)
+        self.length = None if content_length is None else len(self._head) + int(content_length) + len(self._tail)
+
+    @staticmethod
+    def _quote(value):
+        return value.replace('\\', '\\\\').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+    def __iter__(self):
+        yield self._head
+        while True:
+            chunk = self._stream.read(self._chunk_size)
+            if not chunk:
+                break
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            yield chunk
+        yield self._tail
@@ -0,0 +1,208 @@
+import random
+import threading
+import time
+
+import youtrack
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_in):
+        self.retry_in = retry_in
+        Exception.__init__(self, 'Circuit breaker is open, server is considered unavailable for %.1f more seconds'
+                           % retry_in)
+
+
+class RetryRule(object):
+    """ How to react to one HTTP status.
+        attempts  -- total attempts for this status, None means the policy's max_attempts
+        relogin   -- log in again instead of waiting (401/403)
+    """
+    def __init__(self, attempts=None, base_delay=0.5, max_delay=30.0, relogin=False):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.relogin = relogin
+
+
+DEFAULT_RULES = {
+    401: RetryRule(attempts=3, relogin=True),
+    403: RetryRule(attempts=3, relogin=True),
+    429: RetryRule(base_delay=1.0),
+    500: RetryRule(attempts=3, base_delay=0.5, max_delay=5.0),
+    502: RetryRule(base_delay=1.0),
+    503: RetryRule(base_delay=1.0),
+    504: RetryRule(base_delay=2.0),
+}
+
+
+class RetryStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.relogins = 0
+        self.failures = 0
+        self.rejected = 0
+        self.slept = 0.0
+        self.retries_by_status = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return {'calls': self.calls,
+                    'attempts': self.attempts,
+                    'retries': self.retries,
+                    'relogins': self.relogins,
+                    'failures': self.failures,
+                    'rejected': self.rejected,
+                    'slept': self.slept,
+                    'retries_by_status': dict(self.retries_by_status)}
+
+    def _add(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def _retried(self, status, delay, relogin):
+        with self._lock:
+            self.retries += 1
+            self.relogins += int(relogin)
+            self.slept += delay
+            self.retries_by_status[status] = self.retries_by_status.get(status, 0) + 1
+
+
+class CircuitBreaker(object):
+    """ Fails fast after failure_threshold consecutive server errors.
+        After reset_timeout seconds a single probe request is let through;
+        success closes the circuit, failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, failure_statuses=(500, 502, 503, 504),
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_statuses = failure_statuses
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._clock = clock
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                retry_in = self._opened_at + self.reset_timeout - self._clock()
+                if retry_in > 0:
+                    raise CircuitOpenError(retry_in)
+                self.state = self.HALF_OPEN
+            if self._probing:
+                raise CircuitOpenError(0)
+            self._probing = True
+
+    def record(self, status):
+        if status in self.failure_statuses:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class RetryPolicy(object):
+    """ Retries failed requests according to per-status rules with exponential
+        backoff and jitter, giving up after max_attempts or max_total_time seconds.
+        A Retry-After header sent with the response is honoured.
+    """
+    def __init__(self, max_attempts=10, multiplier=2.0, jitter=0.5, max_total_time=300.0, rules=None,
+                 circuit_breaker=None, sleep=time.sleep, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_total_time = max_total_time
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+        self.circuit_breaker = circuit_breaker
+        self.stats = RetryStats()
+        self._sleep = sleep
+        self._clock = clock
+
+    def delay(self, rule, attempt, response=None):
+        delay = min(rule.max_delay, rule.base_delay * self.multiplier ** (attempt - 1))
+        delay *= 1 - self.jitter * random.random()
+        retry_after = response.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def call(self, func, relogin=None):
+        """ Calls func() until it succeeds or the policy gives up.
+            relogin() is called for rules with relogin=True and must return False
+            when there are no credentials to log in with.
+        """
+        breaker = self.circuit_breaker
+        started = self._clock()
+        attempt = 0
+        self.stats._add(calls=1)
+        while True:
+            if breaker is not None:
+                try:
+                    breaker.before_request()
+                except CircuitOpenError:
+                    self.stats._add(rejected=1)
+                    raise
+            attempt += 1
+            self.stats._add(attempts=1)
+            try:
+                result = func()
+            except youtrack.YouTrackException as e:
+                status = e.response.status
+                if breaker is not None:
+                    breaker.record(status)
+                rule = self.rules.get(status)
+                if rule is None or attempt >= min(rule.attempts or self.max_attempts, self.max_attempts):
+                    self.stats._add(failures=1)
+                    raise e
+                if rule.relogin:
+                    if relogin is None or not relogin():
+                        self.stats._add(failures=1)
+                        raise e
+                    delay = 0
+                else:
+                    delay = self.delay(rule, attempt, e.response)
+                    if self._clock() - started + delay > self.max_total_time:
+                        self.stats._add(failures=1)
+                        raise e
+                    self._sleep(delay)
+                self.stats._retried(status, delay, rule.relogin)
+                continue
+            except Exception:
+                if breaker is not None:
+                    breaker.record_failure()
+                self.stats._add(failures=1)
+                raise
+            if breaker is not None:
+                breaker.record_success()
+            return result
@@ -0,0 +1,132 @@
+"""
+JSON and NDJSON snapshots of model objects (Issue, Comment, Link, WorkItem,
+User, ...) and loaders that rebuild them.
+
+Every object is written as a JSON object of its fields plus "$type" (the class
+name) and, when known, "$attributeTypes". Nested objects are written the same
+way, so issues keep their comments, links and attachments.
+"""
+
+import datetime
+import json
+
+import youtrack
+from youtrack.compact import CompactIssue
+
+TYPE_KEY = '$type'
+ATTRIBUTE_TYPES_KEY = '$attributeTypes'
+
+# classes written under the name of the class they stand in for
+ALIASES = {'LazyIssue': 'Issue', 'CompactIssue': 'Issue'}
+
+
+def model_classes():
+    classes = {}
+    pending = [youtrack.YouTrackObject]
+    while pending:
+        cls = pending.pop()
+        if cls.__module__ == youtrack.__name__:
+            classes.setdefault(cls.__name__, cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+def to_data(obj):
+    """ Returns obj as plain dicts and lists, ready for json.
+        Strings are shared with the object, not copied.
+    """
+    if isinstance(obj, youtrack.LazyIssue):
+        obj.materialize()
+    if isinstance(obj, (youtrack.YouTrackObject, CompactIssue)):
+        type_name = obj.__class__.__name__
+        data = {TYPE_KEY: ALIASES.get(type_name, type_name)}
+        items = obj.items() if isinstance(obj, CompactIssue) else obj.__dict__.items()
+        for name, value in items:
+            if name in ('youtrack', '_attribute_types'):
+                continue
+            data[name] = to_data(value)
+        attribute_types = obj._attribute_types
+        if attribute_types:
+            data[ATTRIBUTE_TYPES_KEY] = dict(attribute_types)
+        return data
+    if isinstance(obj, (list, tuple)):
+        return [to_data(value) for value in obj]
+    if isinstance(obj, dict):
+        return dict((name, to_data(value)) for name, value in obj.items())
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8')
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    return obj
+
+
+def from_data(data, connection=None, classes=None):
+    """ Rebuilds the objects in data (as returned by to_data) and attaches them to connection.
+    """
+    if classes is None:
+        classes = model_classes()
+    if isinstance(data, list):
+        return [from_data(value, connection, classes) for value in data]
+    if not isinstance(data, dict):
+        return data
+    cls = classes.get(data.get(TYPE_KEY))
+    if cls is None:
+        return dict((name, from_data(value, connection, classes)) for name, value in data.items())
+    # constructors of some classes expect xml, fill the fields in directly instead
+    obj = cls.__new__(cls)
+    attrs = obj.__dict__
+    attrs['youtrack'] = connection
+    attrs['_attribute_types'] = dict(data.get(ATTRIBUTE_TYPES_KEY) or ())
+    for name, value in data.items():
+        if name != TYPE_KEY and name != ATTRIBUTE_TYPES_KEY:
+            attrs[name] = from_data(value, connection, classes)
+    return obj
+
+
+def _encoder():
+    return json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dump_ndjson(objects, fp):
+    """ Writes one JSON document per line to the text file fp. Returns the number of objects written.
+    """
+    encode = _encoder().encode
+    count = 0
+    for obj in objects:
+        fp.write(encode(to_data(obj)))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+def dump_json(objects, fp):
+    """ Writes objects as a JSON array to the text file fp, one object at a time.
+        Returns the number of objects written.
+    """
+    encode = _encoder().encode
+    count = 0
+    fp.write('[')
+    for obj in objects:
+        if count:
+            fp.write(',\n')
+        fp.write(encode(to_data(obj)))
+        count += 1
+    fp.write(']\n')
+    return count
+
+
+def load_ndjson(fp, connection=None):
+    """ Yields the objects written by dump_ndjson, one line at a time.
+    """
+    classes = model_classes()
+    decode = json.JSONDecoder().decode
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield from_data(decode(line), connection, classes)
+
+
+def load_json(fp, connection=None):
+    """ Returns the list of objects written by dump_json.
+    """
+    return from_data(json.load(fp), connection)
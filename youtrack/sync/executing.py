@@ -1,12 +1,14 @@
 from youtrack import YouTrackException
+from youtrack.batching import AdaptiveBatcher
 
 LOGGED_COMMENT_LENGTH = 10
 
 class SafeCommandExecutor(object):
-    def __init__(self, yt, logger):
+    def __init__(self, yt, logger, batcher=None):
         self.yt = yt
         self.logger = logger
         self.debug_mode = False
+        self.batcher = batcher or AdaptiveBatcher()
 
     def setDebugMode(self, on):
         self.debug_mode = on
@@ -46,8 +48,9 @@ class SafeCommandExecutor(object):
             return None
 
     def importLinks(self, links, permitted_issue_ids):
-        maxLinks = 100
-        links_to_import = []
+        self.batcher.run(self._permitted_links(links, permitted_issue_ids), self._import_links_batch, timer=True)
+
+    def _permitted_links(self, links, permitted_issue_ids):
         for link in links:
             if link.target not in permitted_issue_ids:
                 message = 'failed to import link ' + self._getPrettyLink(link)  + ' because ' + link.target + ' was not imported'
@@ -56,16 +59,12 @@ class SafeCommandExecutor(object):
                 message = 'failed to import link ' + self._getPrettyLink(link) + ' because ' + link.source + ' was not imported'
                 self.logger.logError(None, 'Links', self.yt, message)
             else:
-                links_to_import.append(link)
-                if len(links_to_import) == maxLinks:
-                    self._import_links_batch(links_to_import)
-                    links_to_import = []
-        if len(links_to_import):
-            self._import_links_batch(links_to_import)
+                yield link
 
-    def _import_links_batch(self, links_to_import):
+    def _import_links_batch(self, links_to_import, timer):
         if not self.debug_mode:
-            self.yt.importLinks(links_to_import)
+            with timer:
+                self.yt.importLinks(links_to_import)
         for link in links_to_import:
             message = 'imported ' + self._getPrettyLink(link)
             self.logger.logAction('Links', self.yt, message)
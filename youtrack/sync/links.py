@@ -1,8 +1,11 @@
 import copy
 
+from youtrack.batching import AdaptiveBatcher
+
 class LinkImporter(object):
-    def __init__(self, target, project_id=None, query=None):
+    def __init__(self, target, project_id=None, query=None, batcher=None):
         self.target = target
+        self.batcher = batcher or AdaptiveBatcher()
         self.created_issue_ids = self._get_all_issue_ids_set(self.target, project_id, query) if project_id else set([])
         self.links = []
         self.verbose_mode = False
@@ -23,16 +26,8 @@ class LinkImporter(object):
 
     def _get_all_issue_ids_set(self, yt, project_id, query):
         if not query: query = ''
-        start = 0
         batch = 50
-        result = set([])
-        while True:
-            issues = yt.getIssues(project_id, query, start, batch)
-            if not len(issues): break
-            for issue in issues:
-                result.add(issue.id)
-            start += batch
-        return result
+        return set([issue.id for issue in yt.iterIssues(project_id, query, batch)])
 
     def resetAvailableIssues(self):
         self.created_issue_ids = set([])
@@ -50,24 +45,21 @@ class LinkImporter(object):
         self.links += links
 
     def importLinks(self, links):
-        maxLinks = 100
-        links_to_import = []
+        self.batcher.run(self._permitted_links(links), self._import_links_batch, timer=True)
+
+    def _permitted_links(self, links):
         for link in links:
             if link.target not in self.created_issue_ids:
                 print(self.header + ' failed to import link ' + self._getPrettyLink(link) + ' to ' + self.target_name + ' because ' + link.target + ' was not imported')
             elif link.source not in self.created_issue_ids:
                 print(self.header + 'failed to import link ' + self._getPrettyLink(link) + ' to ' + self.target_name + ' because ' + link.source + ' was not imported')
             else:
-                links_to_import.append(link)
-                if len(links_to_import) == maxLinks:
-                    self._import_links_batch(links_to_import)
-                    links_to_import = []
-        if len(links_to_import):
-            self._import_links_batch(links_to_import)
-
-    def _import_links_batch(self, links_to_import):
+                yield link
+
+    def _import_links_batch(self, links_to_import, timer):
         if not self.verbose_mode:
-            self.target.importLinks(links_to_import)
+            with timer:
+                self.target.importLinks(links_to_import)
         for link in links_to_import:
             print(self.header + ' imported ' + self._getPrettyLink(link) + ' to ' + self.target_name)
 
@@ -1,4 +1,7 @@
+import concurrent.futures
+
 import youtrack
+from youtrack.batching import AdaptiveBatcher
 
 PROHIBITED = '/'
 
@@ -9,9 +12,12 @@ def utf8encode(source):
 
 
 class UserImporter(object):
-    def __init__(self, source, target, caching_users=True, import_groups=True):
+    def __init__(self, source, target, caching_users=True, import_groups=True, batcher=None, workers=8):
         self.source = source
         self.target = target
+        self.batcher = batcher or AdaptiveBatcher()
+        # parallel requests for group memberships, keep it within the connections' pool_size
+        self.workers = workers
         self.caching_users = caching_users
         self.import_groups = import_groups
         #self.created_user_logins = set([user.login for user in target.getUsers()]) if caching_users else set([])
@@ -35,38 +41,49 @@ class UserImporter(object):
     def importUsersRecursively(self, users):
         total_users = len(users)
         if not total_users: return
-        user_list = list(users)
-        max_users = 100
-        start = 0
-        imported_size = 0
-        while start < total_users:
-            user_batch = user_list[start:start + max_users]
-            imported_size += self._import_user_batch_recursively(user_batch)
-            start += max_users
-        return imported_size
-
-    def _import_groups_of(self, yt_user):
-        user_groups = self.source.getUserGroups(yt_user.login)
-        for group in user_groups:
-            if group.name not in self.created_group_names:
-                try:
-                    self.createGroup(group)
-                except Exception as ex:
-                    print(utf8encode(repr(ex)))
-                    continue
-            print("Set " + utf8encode(yt_user.login) + " to " + utf8encode(group.name))
-            self.target.setUserGroup(yt_user.login, group.name)
-
-    def _import_user_batch_recursively(self, users):
+        return sum(self.batcher.run(users, self._import_user_batch_recursively, timer=True))
+
+    def _map(self, func, items):
+        items = list(items)
+        workers = min(self.workers, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def _import_groups_of(self, yt_users):
+        """ Fetches the groups of all users at once, creates every missing group
+            a single time and then adds the users to their groups in parallel.
+        """
+        logins = [yt_user.login for yt_user in yt_users]
+        memberships = self._map(self.source.getUserGroups, logins)
+        missing_groups = dict()
+        for user_groups in memberships:
+            for group in user_groups:
+                if group.name not in self.created_group_names:
+                    missing_groups.setdefault(group.name, group)
+        self._create_groups(list(missing_groups.values()))
+        assignments = [(login, group.name)
+                       for login, user_groups in zip(logins, memberships)
+                       for group in user_groups if group.name in self.created_group_names]
+        self._map(self._set_user_group, assignments)
+
+    def _set_user_group(self, assignment):
+        login, group_name = assignment
+        print("Set " + login + " to " + group_name)
+        self.target.setUserGroup(login, group_name)
+
+    def _import_user_batch_recursively(self, users, timer):
         if not len(users): return 0
         users_to_import = []
         for user in users:
             filtered_user = self._filter_user(user)
             if filtered_user: users_to_import.append(filtered_user)
-        self.target.importUsers(users_to_import)
+        with timer:
+            self.target.importUsers(users_to_import)
+        if self.import_groups:
+            self._import_groups_of(users_to_import)
         for yt_user in users_to_import:
-            if self.import_groups:
-                self._import_groups_of(yt_user)
             if self.caching_users: self.created_user_logins.add(yt_user.login)
         return len(users_to_import)
 
@@ -79,21 +96,30 @@ class UserImporter(object):
 
     def importGroupsWithoutUsers(self, groups):
         if not len(groups): return
+        missing_groups = dict()
         for group in groups:
             if group.name not in self.created_group_names:
-                try:
-                    self.createGroup(group)
-                except Exception as ex:
-                    print(utf8encode(repr(ex)))
+                missing_groups.setdefault(group.name, group)
+        self._create_groups(list(missing_groups.values()))
+
+    def _create_groups(self, groups):
+        group_roles = self._map(lambda group: self.source.getGroupRoles(group.name), groups)
+        for group, roles in zip(groups, group_roles):
+            try:
+                self._create_group(group, roles)
+            except Exception as ex:
+                print(repr(ex))
 
     def createGroup(self, group):
-        group_roles = self.source.getGroupRoles(group.name)
+        self._create_group(group, self.source.getGroupRoles(group.name))
+
+    def _create_group(self, group, group_roles):
         self.target.createGroup(group)
         self.created_group_names.add(group.name)
         for user_role in group_roles:
-            role = self.source.getRole(user_role.name)
-            if role.name not in self.created_role_names:
-                self._create_role(role)
+            # the role is only fetched from the source if it still has to be created
+            if user_role.name not in self.created_role_names:
+                self._create_role(self.source.getRole(user_role.name))
             self._add_user_role_to_group_safely(group, user_role)
 
 
@@ -69,15 +69,11 @@ class YouTrackSynchronizer(object):
 
     def syncAfterImport(self):
         self._create_and_attach_sync_field(self.slave, self.project_id, master_sync_field_name)
-        start = 0
-        issues = self.slave.getIssues(self.project_id, '', start, batch)
-        while len(issues):
-            for issue in issues:
-                issue_id = issue.id
-                issue_number = issue_id.rpartition('-')[2]
-                self._mark_issues_as_sync(issue_number, issue_id, issue_id)
-            start += batch
-            issues = self.slave.getIssues(self.project_id, '', start, batch)
+        # marking issues doesn't change what the empty filter returns, so pages can be prefetched
+        for issue in self.slave.iterIssues(self.project_id, '', batch):
+            issue_id = issue.id
+            issue_number = issue_id.rpartition('-')[2]
+            self._mark_issues_as_sync(issue_number, issue_id, issue_id)
 
     def _slave_ids_set_to_sync_ids_set(self, ids):
         return set([self.issue_binder.slaveIssueIdToMasterIssueId(id) for id in ids])
@@ -100,37 +96,37 @@ class YouTrackSynchronizer(object):
 
     def _apply_to_issues(self, issues_getter, action, excluded_ids=None, log_header=''):
         if not issues_getter or not action: return
-        start = 0
         print(log_header + ' started...')
-        issues = issues_getter(start, batch)
+        # the actions take issues out of the filters (sync field set, updated moved past
+        # current_run), which shifts later pages; read the whole result before changing anything
+        issues = list(issues_getter())
         processed_issue_ids_set = set([])
-        while len(issues):
-            for issue in issues:
+        for start in range(0, len(issues), batch):
+            page = issues[start:start + batch]
+            for issue in page:
                 sync_id = str(issue.id)
                 if not (excluded_ids and sync_id in excluded_ids):
                     action(issue)
                     processed_issue_ids_set.add(sync_id)
-            print(log_header + ' processed ' + str(start + len(issues)) + ' issues')
-            start += batch
-            issues = issues_getter(start, batch)
+            print(log_header + ' processed ' + str(start + len(page)) + ' issues')
         print(log_header + ' action applied to ' + str(len(processed_issue_ids_set)) + ' issues')
         return processed_issue_ids_set
 
-    def _get_tagged_only_in_slave(self, start, batch):
+    def _get_tagged_only_in_slave(self):
         rq = self.query + ' ' + master_sync_field_name + ':  {' + empty_field_text + '}'
-        return self.slave.getIssues(self.project_id, rq, start, batch)
+        return self.slave.iterIssues(self.project_id, rq, batch)
 
-    def _get_tagged_in_master(self, start, batch):
+    def _get_tagged_in_master(self):
         rq = self.query
-        return self.master.getIssues(self.project_id, rq, start, batch)
+        return self.master.iterIssues(self.project_id, rq, batch)
 
-    def _get_updated_in_slave_from_last_run(self, start, batch):
+    def _get_updated_in_slave_from_last_run(self):
         rq = get_advanced_query(self.query, self.last_run, self.current_run)
-        return self.slave.getIssues(self.project_id, rq, start, batch)
+        return self.slave.iterIssues(self.project_id, rq, batch)
 
-    def _get_updated_in_master_from_last_run(self, start, batch):
+    def _get_updated_in_master_from_last_run(self):
         rq = get_advanced_query(self.query, self.last_run, self.current_run)
-        return self.master.getIssues(self.project_id, rq, start, batch)
+        return self.master.iterIssues(self.project_id, rq, batch)
 
     def _mark_issues_as_sync(self, master_issue_number, master_issue_id, slave_issue_id):
         self.master_executor.executeCommand(master_issue_id, "tag " + tag)
@@ -0,0 +1,127 @@
+import contextlib
+import threading
+import time
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class _Lane(object):
+    """ Token bucket plus in-flight limit for one kind of request.
+        Both limits shrink when the server pushes back and grow back
+        towards the configured values while requests succeed.
+    """
+    def __init__(self, rate, burst, max_in_flight, clock):
+        self.configured_rate = rate
+        self.configured_limit = max_in_flight
+        self.rate = rate
+        self.limit = float(max_in_flight) if max_in_flight is not None else None
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.tokens = self.burst
+        self.in_flight = 0
+        self.throttled = 0
+        self._clock = clock
+        self._refilled_at = clock()
+        self._throttled_at = None
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                if self.limit is not None and self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                    continue
+                if self.rate is not None:
+                    self._refill()
+                    if self.tokens < 1:
+                        self._condition.wait((1 - self.tokens) / self.rate)
+                        continue
+                    self.tokens -= 1
+                self.in_flight += 1
+                return
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def throttle(self, factor, min_fraction, cooldown):
+        with self._condition:
+            now = self._clock()
+            # responses to requests sent before the last decrease must not shrink the limits again
+            if self._throttled_at is not None and now - self._throttled_at < cooldown:
+                return
+            self._throttled_at = now
+            self.throttled += 1
+            if self.rate is not None:
+                self._refill()
+                self.rate = max(self.configured_rate * min_fraction, self.rate * factor)
+            if self.limit is not None:
+                self.limit = max(1.0, self.limit * factor)
+
+    def recover(self, step, cooldown):
+        with self._condition:
+            if self._throttled_at is not None and self._clock() - self._throttled_at < cooldown:
+                return
+            if self.rate is not None and self.rate < self.configured_rate:
+                self._refill()
+                self.rate = min(self.configured_rate, self.rate + self.configured_rate * step)
+            if self.limit is not None and self.limit < self.configured_limit:
+                self.limit = min(float(self.configured_limit), self.limit + self.configured_limit * step)
+                self._condition.notify_all()
+
+
+class Governor(object):
+    """ Client-side throttle for one YouTrack server.
+        Reads (GET) and writes (PUT/POST/DELETE) get separate request rates
+        (requests per second, None for unlimited) and separate in-flight limits.
+        Assign the same instance to the `governor` attribute of every Connection
+        talking to the server so they share one budget.
+        On 429/503/504 responses the limits of that lane are multiplied by
+        backoff_factor (at most once per cooldown seconds); every successful
+        response restores recovery_step of the configured value.
+    """
+    def __init__(self, read_rate=None, write_rate=None, max_reads_in_flight=None, max_writes_in_flight=None,
+                 read_burst=None, write_burst=None, backoff_factor=0.5, recovery_step=0.02, min_fraction=0.05,
+                 cooldown=1.0, throttle_statuses=(429, 503, 504), clock=time.monotonic):
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.min_fraction = min_fraction
+        self.cooldown = cooldown
+        self.throttle_statuses = throttle_statuses
+        self.reads = _Lane(read_rate, read_burst, max_reads_in_flight, clock)
+        self.writes = _Lane(write_rate, write_burst, max_writes_in_flight, clock)
+
+    def _lane(self, method):
+        return self.reads if method.upper() in READ_METHODS else self.writes
+
+    @contextlib.contextmanager
+    def request(self, method):
+        lane = self._lane(method)
+        lane.acquire()
+        try:
+            yield
+        finally:
+            lane.release()
+
+    def record(self, method, status):
+        lane = self._lane(method)
+        if status in self.throttle_statuses:
+            lane.throttle(self.backoff_factor, self.min_fraction, self.cooldown)
+        elif status < 500:
+            lane.recover(self.recovery_step, self.cooldown)
+
+    def snapshot(self):
+        result = {}
+        for name, lane in (('reads', self.reads), ('writes', self.writes)):
+            result[name] = {'rate': lane.rate,
+                            'configured_rate': lane.configured_rate,
+                            'max_in_flight': int(lane.limit) if lane.limit is not None else None,
+                            'configured_max_in_flight': lane.configured_limit,
+                            'in_flight': lane.in_flight,
+                            'throttled': lane.throttled}
+        return result
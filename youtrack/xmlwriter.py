@@ -0,0 +1,133 @@
+"""
+Bodies for the bulk /import endpoints, written once, in order, as UTF-8 bytes.
+"""
+
+import io
+from xml.sax.saxutils import escape, quoteattr
+
+COMMENT_ENTITIES = {'\n': '&#xA;'}
+
+
+def text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+
+def is_multiple(value):
+    return not isinstance(value, (str, bytes)) and hasattr(value, '__iter__')
+
+
+def get(item, name, default=None):
+    """ Reads name from a dict or a YouTrackObject.
+    """
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+class XmlWriter(object):
+    """ Appends UTF-8 encoded markup to a binary buffer.
+        Positions returned by tell() can be used to slice single records out
+        of getvalue() later without keeping a second copy of them.
+    """
+    def __init__(self, out=None):
+        self.out = io.BytesIO() if out is None else out
+        self._write = self.out.write
+
+    def write(self, markup):
+        self._write(markup.encode('utf-8'))
+
+    def tell(self):
+        return self.out.tell()
+
+    def getvalue(self):
+        return self.out.getvalue()
+
+    def empty_element(self, indent, tag, attrs, entities=None):
+        entities = entities or {}
+        parts = [indent, '<', tag]
+        for name, value in attrs:
+            parts.append(' %s=%s' % (text(name), quoteattr(text(value), entities)))
+        parts.append('/>\n')
+        self.write(''.join(parts))
+
+
+def write_issue(writer, issue, bad_fields):
+    parts = ['  <issue>\n']
+    comments = None
+    if getattr(issue, 'getComments', None):
+        comments = issue.getComments()
+    for name in issue:
+        value = issue[name]
+        if value is None:
+            continue
+        name = text(name)
+        if name == 'comments':
+            comments = value
+        elif name not in bad_fields:
+            parts.append('    <field name=%s>\n' % quoteattr(name))
+            for v in (value if is_multiple(value) else (value,)):
+                parts.append('      <value>%s</value>\n' % escape(text(v).strip()))
+            parts.append('    </field>\n')
+    writer.write(''.join(parts))
+    if comments:
+        for comment in comments:
+            writer.empty_element('    ', 'comment',
+                                 [(ca, comment[ca]) for ca in comment
+                                  if comment[ca] is not None and not is_multiple(comment[ca])],
+                                 COMMENT_ENTITIES)
+    writer.write('  </issue>\n')
+
+
+def issues_document(issues, bad_fields):
+    """ Returns the /import/{project}/issues body and a list of (numberInProject, start, end)
+        telling where each issue record is in it, in the order of issues.
+    """
+    writer = XmlWriter()
+    writer.write('<issues>\n')
+    records = []
+    for issue in issues:
+        start = writer.tell()
+        write_issue(writer, issue, bad_fields)
+        records.append((text(get(issue, 'numberInProject')), start, writer.tell()))
+    writer.write('</issues>')
+    return writer.getvalue(), records
+
+
+def users_document(users, known_attrs=('login', 'fullName', 'email', 'jabber')):
+    writer = XmlWriter()
+    writer.write('<list>\n')
+    for user in users:
+        writer.empty_element('  ', 'user', [(k, user[k]) for k in user if k in known_attrs])
+    writer.write('</list>')
+    return writer.getvalue()
+
+
+def links_document(links, ignored_attrs=('typeInward', 'typeOutward')):
+    writer = XmlWriter()
+    writer.write('<list>\n')
+    for link in links:
+        writer.empty_element('  ', 'link', [(attr, link[attr]) for attr in link if attr not in ignored_attrs])
+    writer.write('</list>')
+    return writer.getvalue()
+
+
+def work_items_document(work_items):
+    writer = XmlWriter()
+    writer.write('<workItems>')
+    for work_item in work_items:
+        parts = ['<workItem>',
+                 '<date>%s</date>' % escape(text(work_item.date)),
+                 '<duration>%s</duration>' % escape(text(work_item.duration))]
+        if getattr(work_item, 'description', None) is not None:
+            parts.append('<description>%s</description>' % escape(text(work_item.description)))
+        if getattr(work_item, 'worktype', None) is not None:
+            parts.append('<worktype><name>%s</name></worktype>' % escape(text(work_item.worktype)))
+        parts.append('<author login=%s></author>' % quoteattr(text(work_item.authorLogin)))
+        parts.append('</workItem>')
+        writer.write(''.join(parts))
+    writer.write('</workItems>')
+    return writer.getvalue()
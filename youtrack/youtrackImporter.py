@@ -1,7 +1,12 @@
+import concurrent.futures
 import itertools
+import threading
+import time
+import urllib.error
 
 import youtrack
 from youtrack import YouTrackException, Issue
+from youtrack.batching import AdaptiveBatcher, estimate_size
 from youtrack.importHelper import create_custom_field
 
 __author__ = 'user'
@@ -14,10 +19,17 @@ NUMBER_IN_PROJECT = 'numberInProject'
 
 
 class YouTrackImporter(object):
-    def __init__(self, source, target, import_config):
+    def __init__(self, source, target, import_config, attachment_workers=4, attachment_retries=3, batcher=None,
+                 attachment_backlog=None):
         self._source = source
         self._target = target
         self._import_config = import_config
+        # batches hold (source issue, youtrack issue) pairs
+        self._batcher = batcher or AdaptiveBatcher(size_of=lambda pair: estimate_size(pair[1]))
+        self._attachment_workers = attachment_workers
+        self._attachment_retries = attachment_retries
+        # issues whose attachments may wait for a worker before issue import pauses
+        self._attachment_backlog = attachment_backlog or 4 * attachment_workers
 
     def do_import(self, projects, new_projects_owner_login='root'):
         project_ids = list(projects.keys())
@@ -66,19 +78,28 @@ class YouTrackImporter(object):
                 # print(u'Field [%s] is already attached' % field_name)
 
     def _import_issues(self, project_id):
-        limit = 100
-        all_issues = self._get_issues(project_id)
-        while True:
-            issues = list(itertools.islice(all_issues, None, limit))
-            if not len(issues):
-                break
-            self._target.importIssues(project_id, project_id + ' assignees',
-                [self._to_yt_issue(issue, project_id) for issue in issues])
-            for issue in issues:
-                issue_id = self._get_issue_id(issue)
-                issue_attachments = self._get_attachments(issue)
-                yt_issue_id = '%s-%s' % (project_id, issue_id)
-                self._import_attachments(yt_issue_id, issue_attachments)
+        all_issues = ((issue, self._to_yt_issue(issue, project_id)) for issue in self._get_issues(project_id))
+        # attachments are transferred in the background while the next batches are imported
+        backlog = threading.BoundedSemaphore(self._attachment_backlog)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._attachment_workers) as attachment_stage:
+            def import_batch(batch, timer):
+                with timer:
+                    self._target.importIssues(project_id, project_id + ' assignees',
+                        [yt_issue for issue, yt_issue in batch])
+                for issue, yt_issue in batch:
+                    issue_id = self._get_issue_id(issue)
+                    yt_issue_id = '%s-%s' % (project_id, issue_id)
+                    issue_attachments = self._get_attachments(issue)
+                    # blocks while the stage is full, so issue import can't run far ahead of it
+                    backlog.acquire()
+                    future = attachment_stage.submit(self._import_attachments, yt_issue_id, issue_attachments)
+                    future.add_done_callback(lambda f, yt_issue_id=yt_issue_id: attachments_done(f, yt_issue_id))
+
+            def attachments_done(future, yt_issue_id):
+                backlog.release()
+                if future.exception() is not None:
+                    print('Failed to import attachments for issue [%s]: %s' % (yt_issue_id, future.exception()))
+            self._batcher.run(all_issues, import_batch, timer=True)
 
     def _import_tags(self, project_ids):
         limit = 100
@@ -206,11 +227,22 @@ class YouTrackImporter(object):
         custom_field = self._target.getProjectCustomField(project_id, field_name)
         if hasattr(custom_field, 'bundle'):
             bundle = self._target.getBundle(field_type, custom_field.bundle)
+            if self._bundle_contains(bundle, value):
+                return
             try:
                 self._target.addValueToBundle(bundle, value)
             except YouTrackException:
                 pass
 
+    @staticmethod
+    def _bundle_contains(bundle, value):
+        if isinstance(bundle, youtrack.UserBundle):
+            # members of the bundle's groups aren't listed, those are added again
+            login = value if isinstance(value, str) else getattr(value, 'login', None)
+            return any(user.login == login for user in bundle.users)
+        name = value if isinstance(value, str) else getattr(value, 'name', None)
+        return any(element.name == name for element in getattr(bundle, 'values', ()))
+
     def get_field_value(self, field_name, field_type, value):
         if value is None:
             return None
@@ -261,8 +293,26 @@ class YouTrackImporter(object):
         raise NotImplementedError
 
     def _import_attachments(self, issue_id, issue_attachments):
+        # runs on the attachment workers of _import_issues
         for attach in issue_attachments:
-            self._target.createAttachmentFromAttachment(issue_id, attach)
+            self._import_attachment_with_retry(issue_id, attach)
+
+    def _import_attachment(self, issue_id, attach):
+        self._target.createAttachmentFromAttachment(issue_id, attach, raise_errors=True)
+
+    def _import_attachment_with_retry(self, issue_id, attach):
+        attempt = 0
+        while True:
+            try:
+                return self._import_attachment(issue_id, attach)
+            except Exception as e:
+                attempt += 1
+                # client errors won't go away on retry
+                permanent = isinstance(e, urllib.error.HTTPError) and 400 <= e.code < 500 and e.code != 429
+                if permanent or attempt > self._attachment_retries:
+                    print('Failed to import attachment for issue [%s]: %s' % (issue_id, e))
+                    return None
+                time.sleep(2 ** attempt)
 
     def _get_comments(self, issue):
         raise NotImplementedError